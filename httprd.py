@@ -17,16 +17,29 @@
 VERSION = '4.1'
 
 import json
+import struct
 import aiohttp
 import aiohttp.web
 import argparse
+import asyncio
 import base64
+import concurrent.futures
+import contextlib
+import fractions
+import functools
 import gzip
+import hmac
+import logging
+import logging.handlers
+import mss
+import numpy
 import PIL
 import PIL.Image
-import PIL.ImageGrab
-import PIL.ImageChops
 import pyautogui
+import queue
+import sys
+import threading
+import time
 import traceback
 
 from datetime import datetime
@@ -36,12 +49,119 @@ try:
 except ImportError:
     from io import BytesIO
 
+# Optional libjpeg-turbo encoder, falls back to Pillow if library is not available
+try:
+    import turbojpeg
+    turbo_jpeg = turbojpeg.TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
+
+# Optional OpenCV resize, falls back to Pillow
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Optional H.264 encoding with PyAV (ffmpeg)
+try:
+    import av
+except ImportError:
+    av = None
+
+# Optional faster JSON parser for input events, both accept bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Optional JIT-compiled frame diff, falls back to numpy
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Optional libuv event loop, not available on Windows
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Optional fast hash for unchanged frame detection, falls back to shared grab identity check
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Optional direct input backend, falls back to pyautogui, fails to import without display on Linux
+try:
+    import pynput.keyboard
+    import pynput.mouse
+except ImportError:
+    pynput = None
+
+# Optional DXGI Desktop Duplication capture on Windows, falls back to mss
+try:
+    import dxcam
+except (ImportError, OSError, AttributeError):
+    dxcam = None
+
 # Const config
 DOWNSAMPLE = PIL.Image.BILINEAR
+# Integer box reduction applied before DOWNSAMPLE while image is larger than (reducing_gap * target size), trades quality for speed, None to disable
+DOWNSAMPLE_REDUCING_GAP = 2.0
+# Cheap box filter is used instead of DOWNSAMPLE for downscale factor at least DOWNSAMPLE_BOX_MIN_FACTOR and quality below DOWNSAMPLE_BOX_MAX_QUALITY, JPEG artifacts hide the difference
+DOWNSAMPLE_BOX = PIL.Image.BOX
+DOWNSAMPLE_BOX_MIN_FACTOR = 2.0
+DOWNSAMPLE_BOX_MAX_QUALITY = 60
 # Minimal amount of partial frames to be sent before sending full repaint frame to avoid fallback to full repaint on long delay channels
 MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT = 60
 # Minimal amount of empty frames to be sent before sending full repaint frame to avoid fallback to full repaint on long delay channels
 MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT = 120
+# Color bytes of little-endian BGRA pixel word
+PIXEL_COLOR_MASK = 0x00FFFFFF
+# Changed rows or columns separated by more than DIRTY_REGION_GAP unchanged ones are sent as separate regions
+DIRTY_REGION_GAP = 16
+# Max amount of regions in multi-region frame, more regions are merged pairwise with least extra area
+MAX_DIRTY_REGIONS = 8
+# Changed areas split into more regions are not merged and sent as single bounding box
+MAX_MERGED_REGIONS = 64
+# Multi-region frame is sent only if regions cover less than this part of their bounding box, each region costs extra image headers
+MAX_DIRTY_REGIONS_AREA = 0.5
+# Vertical scroll is searched in changed area of at least SCROLL_MIN_HEIGHT rows, client moves drawn pixels instead of receiving them again
+SCROLL_MIN_HEIGHT = 64
+# Min amount of rows matching at same offset to accept scroll
+SCROLL_MIN_ROWS = 16
+# Amount of sampled columns in row signature for scroll search
+SCROLL_SIGNATURE_COLUMNS = 64
+# Scroll frame is sent only if it leaves less than this part of changed area to encode
+SCROLL_MAX_AREA = 0.5
+# JPEG chroma subsampling by --chroma value, same numbers for Pillow subsampling and TJSAMP_*
+JPEG_SUBSAMPLING = { '420': 2, '422': 1, '444': 0 }
+# Frame send waits for drain once socket write buffer holds more than WRITE_BUFFER_HIGH bytes until it gets below WRITE_BUFFER_LOW, default limit of 64 KiB stalls on every large frame
+WRITE_BUFFER_HIGH = 1 << 20
+WRITE_BUFFER_LOW = 256 << 10
+# Empty frame is sent without grab & encode while socket write buffer holds more than MAX_WRITE_BUFFER_SIZE bytes. Finished send leaves
+# up to WRITE_BUFFER_HIGH bytes in buffer, so check against low mark catches link that has not drained previous frames
+MAX_WRITE_BUFFER_SIZE = WRITE_BUFFER_LOW
+# Amount of threads for screen grab, resize & encode, keeps event loop free during frame processing
+CAPTURE_THREADS = 2
+# Max screen grab rate, frame requests coming faster reuse last grab
+MAX_CAPTURE_FPS = 60
+# Websocket ping interval in seconds, keeps NAT mappings open and closes dead connections
+WS_HEARTBEAT = 30.0
+# Background capture stops after CAPTURE_IDLE_TIMEOUT seconds without frame requests
+CAPTURE_IDLE_TIMEOUT = 1.0
+# Smoothing factor of average interval between frame requests, background grab is timed to complete by next expected request
+CAPTURE_INTERVAL_EWMA = 0.2
+
+# H.264 encoders tried in order as (name, options, quality option), hardware first, no B-frames for low latency
+H264_ENCODERS = [
+    ('h264_nvenc', { 'preset': 'p1', 'tune': 'ull', 'zerolatency': '1', 'delay': '0', 'profile': 'baseline' }, 'cq'),
+    ('libx264', { 'preset': 'ultrafast', 'tune': 'zerolatency', 'profile': 'baseline' }, 'crf'),
+]
+# Keyframe interval in frames, client can not start decoding until keyframe
+H264_GOP_SIZE = 120
 
 # Input event types
 INPUT_EVENT_MOUSE_MOVE   = 0
@@ -51,36 +171,197 @@ INPUT_EVENT_MOUSE_SCROLL = 3
 INPUT_EVENT_KEY_DOWN     = 4
 INPUT_EVENT_KEY_UP       = 5
 
+# Mouse button index to pyautogui button name
+MOUSE_BUTTONS = ('left', 'middle', 'right')
+
+# pyautogui key name to pynput Key name, other named keys are sent with pyautogui
+PYNPUT_KEY_NAMES = {
+    'altleft':     'alt_l',
+    'altright':    'alt_r',
+    'backspace':   'backspace',
+    'capslock':    'caps_lock',
+    'ctrlleft':    'ctrl_l',
+    'ctrlright':   'ctrl_r',
+    'delete':      'delete',
+    'down':        'down',
+    'end':         'end',
+    'enter':       'enter',
+    'escape':      'esc',
+    'home':        'home',
+    'insert':      'insert',
+    'left':        'left',
+    'nexttrack':   'media_next',
+    'numlock':     'num_lock',
+    'pagedown':    'page_down',
+    'pageup':      'page_up',
+    'pause':       'pause',
+    'playpause':   'media_play_pause',
+    'prevtrack':   'media_previous',
+    'printscreen': 'print_screen',
+    'right':       'right',
+    'scrolllock':  'scroll_lock',
+    'shiftleft':   'shift_l',
+    'shiftright':  'shift_r',
+    'space':       'space',
+    'tab':         'tab',
+    'up':          'up',
+    'volumedown':  'media_volume_down',
+    'volumemute':  'media_volume_mute',
+    'volumeup':    'media_volume_up',
+    'winleft':     'cmd_l',
+    'winright':    'cmd_r',
+    **{ f'f{ i }': f'f{ i }' for i in range(1, 25) },
+}
+
 # Failsafe disable
 pyautogui.FAILSAFE = False
+# No sleep after each call, it would hold input thread shared by all sessions
+pyautogui.PAUSE = 0
+
+# Direct mouse input on Windows, one syscall per event without pyautogui wrappers
+if sys.platform == 'win32':
+    import ctypes
+    import ctypes.wintypes
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [
+            ('dx', ctypes.wintypes.LONG),
+            ('dy', ctypes.wintypes.LONG),
+            ('mouseData', ctypes.wintypes.DWORD),
+            ('dwFlags', ctypes.wintypes.DWORD),
+            ('time', ctypes.wintypes.DWORD),
+            ('dwExtraInfo', ctypes.c_size_t),
+        ]
+
+    # MOUSEINPUT is the largest member of INPUT union
+    class INPUT(ctypes.Structure):
+        _fields_ = [
+            ('type', ctypes.wintypes.DWORD),
+            ('mi', MOUSEINPUT),
+        ]
+
+    INPUT_MOUSE = 0
+    MOUSEEVENTF_WHEEL = 0x0800
+
+    # (down, up) flags for left, middle, right
+    MOUSEEVENTF_BUTTONS = ((0x0002, 0x0004), (0x0020, 0x0040), (0x0008, 0x0010))
+
+    user32 = ctypes.windll.user32
+
+    # Preallocated input struct, handlers run in single input thread only
+    mouse_input = INPUT(type=INPUT_MOUSE)
+    mouse_input_size = ctypes.sizeof(INPUT)
 
 # Args
 args = {}
 
+# Encoded passwords for constant-time compare
+password_bytes, view_password_bytes = None, None
+
+# JPEG chroma subsampling, 4:2:0 unless set by --chroma
+jpeg_subsampling = JPEG_SUBSAMPLING['420']
+
+# Max color channel difference of pixel treated as unchanged, set by --diff_threshold
+diff_threshold = 0
+
+# pynput controllers, None with pyautogui input backend
+pynput_mouse, pynput_keyboard = None, None
+
+# pynput buttons by button index & keys by pyautogui key name, filled on pynput backend start
+pynput_buttons = ()
+pynput_keys = {}
+
 # Real resolution
 real_width, real_height = 0, 0
 
 # Webapp
 app: aiohttp.web.Application
 
+# Request log, lines are written to console by listener thread instead of event loop
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger('httprd')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+
+# Request log disabled by --quiet
+quiet = False
+
+# Log timestamp, formatted once per second
+log_timestamp = ''
+log_timestamp_second = 0
+
+# Threads for blocking frame processing
+capture_pool = concurrent.futures.ThreadPoolExecutor(max_workers=CAPTURE_THREADS, thread_name_prefix='capture')
+
+# Single thread for blocking input calls, keeps events of all sessions in order
+input_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='input')
+
+# Odd weights of row signature in scroll search
+scroll_signature_weights = numpy.random.default_rng(0).integers(1, 1 << 63, size=SCROLL_SIGNATURE_COLUMNS, dtype=numpy.uint64) | 1
+
+# Per-thread screen capture state, mss handles can not be shared between threads
+capture_local = threading.local()
+
+# Screen grab in progress, shared between concurrent frame requests, monotonic time of its start & duration of last grab
+grab_future: asyncio.Future = None
+grab_start_time = 0.0
+grab_duration = 0.0
+
+# Background capture loop and event of frame request
+capture_task: asyncio.Task = None
+capture_event: asyncio.Event = None
+
+# Monotonic time of last frame request and average interval between requests
+grab_request_time = 0.0
+grab_request_interval = 0.0
+
+# DXGI duplication camera & last returned frame, camera returns None if nothing changed since previous grab
+dxcam_camera = None
+dxcam_frame: numpy.ndarray = None
+
+# Last completed screen grab and monotonic time of completion
+grab_result: numpy.ndarray = None
+grab_result_time = 0.0
+
+
+# Precompiled little-endian codecs
+INT8 = struct.Struct('<B')
+INT16 = struct.Struct('<H')
+INT16_SIGNED = struct.Struct('<h')
+INT32 = struct.Struct('<I')
+# Frame request payload: viewport_width, viewport_height, quality
+FRAME_REQUEST = struct.Struct('<HHB')
+# Frame response header: packet_type, remote_width, remote_height, frame_type & frame type fields
+FRAME_HEADER = struct.Struct('<BHHB')
+FRAME_HEADER_PARTIAL = struct.Struct('<BHHBHH') # crop_x, crop_y
+FRAME_HEADER_H264 = struct.Struct('<BHHBB') # is_keyframe
+FRAME_HEADER_REGIONS = struct.Struct('<BHHBH') # region_count
+FRAME_HEADER_SCROLL = struct.Struct('<BHHBHHHHHHH') # src_x, src_y, width, height, dst_x, dst_y, region_count
+# Region header in multi-region frame: x, y, width, height, length
+REGION_HEADER = struct.Struct('<HHHHI')
 
 def decode_int8(data):
-    return int.from_bytes(data[0:1], 'little')
+    return data[0]
 
 def decode_int16(data):
-    return int.from_bytes(data[0:2], 'little')
+    return INT16.unpack_from(data)[0]
 
 def decode_int24(data):
-    return int.from_bytes(data[0:3], 'little')
+    return data[0] | data[1] << 8 | data[2] << 16
+
+def decode_int32(data):
+    return INT32.unpack_from(data)[0]
 
-def encode_int8(i):
-    return int.to_bytes(i, 1, 'little')
+encode_int8 = INT8.pack
 
-def encode_int16(i):
-    return int.to_bytes(i, 2, 'little')
+encode_int16 = INT16.pack
 
 def encode_int24(i):
-    return int.to_bytes(i, 3, 'little')
+    return INT32.pack(i & 0xFFFFFF)[:3]
+
+encode_int32 = INT32.pack
 
 def dump_bytes_dec(data):
     for i in range(len(data)):
@@ -88,21 +369,737 @@ def dump_bytes_dec(data):
     print()
 
 
+def decode_input_events(data) -> list:
+    """
+    Decode binary input packet payload into event lists in same format as JSON
+    input packet
+    """
+
+    events = []
+    offset = 0
+
+    while offset < len(data):
+        event_type = data[offset]
+        offset += 1
+
+        # Keys are length-prefixed ascii names
+        if event_type == INPUT_EVENT_KEY_DOWN or event_type == INPUT_EVENT_KEY_UP:
+            if offset >= len(data):
+                raise ValueError('Truncated input packet')
+
+            length = data[offset]
+            events.append([ event_type, bytes.decode(data[offset + 1:offset + 1 + length], encoding='ascii') ])
+            offset += 1 + length
+            continue
+
+        if event_type > INPUT_EVENT_KEY_UP:
+            raise ValueError(f'Unknown input event type { event_type }')
+
+        # Mouse events are x, y and button or scroll delta, truncated fields give same error as truncated key
+        if event_type == INPUT_EVENT_MOUSE_DOWN or event_type == INPUT_EVENT_MOUSE_UP:
+            size = 5
+        elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+            size = 6
+        else:
+            size = 4
+
+        if offset + size > len(data):
+            raise ValueError('Truncated input packet')
+
+        event = [ event_type, INT16.unpack_from(data, offset)[0], INT16.unpack_from(data, offset + 2)[0] ]
+        offset += 4
+
+        if event_type == INPUT_EVENT_MOUSE_DOWN or event_type == INPUT_EVENT_MOUSE_UP:
+            event.append(data[offset])
+            offset += 1
+        elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+            event.append(INT16_SIGNED.unpack_from(data, offset)[0])
+            offset += 2
+
+        events.append(event)
+
+    # Last event cut off
+    if offset > len(data):
+        raise ValueError('Truncated input packet')
+
+    return events
+
+
+def coalesce_input_events(data: list) -> list:
+    """
+    Keep only last of consecutive mouse moves and sum consecutive scrolls at
+    position of last, each applied event is an input syscall. Malformed events
+    are kept as is for handler to drop and never merged with neighbours
+    """
+
+    events = []
+    mergeable = False
+
+    for event in data:
+
+        # Validate move & scroll fields before merge
+        try:
+            event_type = event[0]
+            if event_type == INPUT_EVENT_MOUSE_MOVE:
+                event = [ event_type, int(event[1]), int(event[2]) ]
+            elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+                event = [ event_type, int(event[1]), int(event[2]), int(event[3]) ]
+            else:
+                events.append(event)
+                mergeable = False
+                continue
+        except (IndexError, KeyError, TypeError, ValueError):
+            events.append(event)
+            mergeable = False
+            continue
+
+        if mergeable and events[-1][0] == event_type:
+            if event_type == INPUT_EVENT_MOUSE_SCROLL:
+                event[3] += events[-1][3]
+
+            events[-1] = event
+        else:
+            events.append(event)
+            mergeable = True
+
+    return events
+
+
+def log_request(request: aiohttp.web.Request, label: str = None):
+    """
+    Log request with timestamp cached for current second
+    """
+
+    global log_timestamp, log_timestamp_second
+
+    if quiet:
+        return
+
+    second = int(time.time())
+    if second != log_timestamp_second:
+        log_timestamp = datetime.fromtimestamp(second).strftime("%d.%m.%Y-%H:%M:%S")
+        log_timestamp_second = second
+
+    if label is None:
+        logger.info(f'[{ log_timestamp }] { request.remote } { request.method } { request.path_qs }')
+    else:
+        logger.info(f'[{ log_timestamp }] { request.remote } { request.method } [{ label }] { request.path_qs }')
+
+
+def check_access(request: aiohttp.web.Request, view: bool) -> bool:
+    """
+    Check request password against control password or view password if view access is allowed
+    """
+
+    password = request.query.get('password', '').strip().encode('utf-8')
+
+    if password_bytes is not None and hmac.compare_digest(password, password_bytes):
+        return True
+
+    return view and view_password_bytes is not None and hmac.compare_digest(password, view_password_bytes)
+
+
+def grab_screen() -> numpy.ndarray:
+    """
+    Capture primary monitor or all monitors in fullscreen mode as BGRA array
+    """
+
+    global dxcam_camera, dxcam_frame
+
+    # DXGI duplication covers single output only
+    if dxcam is not None and not args.fullscreen:
+        if dxcam_camera is None:
+            dxcam_camera = dxcam.create(output_color='BGRA')
+
+        frame = dxcam_camera.grab()
+
+        # No change on screen, same array lets callers skip diff
+        if frame is None:
+            if dxcam_frame is not None:
+                return dxcam_frame
+        else:
+            dxcam_frame = frame
+            return frame
+
+    # Reuse mss instance, it keeps device context between grabs
+    sct = getattr(capture_local, 'sct', None)
+    if sct is None:
+        sct = capture_local.sct = mss.mss()
+
+        # Resolve captured monitor once, monitor 0 is bounding box of all monitors
+        capture_local.monitor = sct.monitors[0 if args.fullscreen else 1]
+
+    shot = sct.grab(capture_local.monitor)
+
+    # Wrap raw BGRA buffer without copy, mss RGB conversion is done in python
+    return numpy.frombuffer(shot.raw, dtype=numpy.uint8).reshape(shot.height, shot.width, 4)
+
+
+def start_grab(now: float) -> asyncio.Future:
+    """
+    Start screen grab in capture thread, result is stored as latest grab
+    """
+
+    global grab_future, grab_start_time
+
+    grab_start_time = now
+    grab_future = asyncio.get_running_loop().run_in_executor(capture_pool, grab_screen)
+    grab_future.add_done_callback(grab_done)
+
+    return grab_future
+
+
+def grab_done(future: asyncio.Future):
+    """
+    Store completed grab, called before requests waiting for it resume
+    """
+
+    global grab_result, grab_result_time, grab_duration
+
+    if future.cancelled() or future.exception() is not None:
+        return
+
+    grab_result = future.result()
+    grab_result_time = time.monotonic()
+    grab_duration = grab_result_time - grab_start_time
+
+
+async def capture_loop():
+    """
+    Grab screen in background while frames are requested, next grab is timed
+    to complete by expected next request so requests do not wait for capture
+    """
+
+    while True:
+        future = grab_future
+        started = grab_start_time
+        await asyncio.wait((future, ))
+
+        # Wait until grab is used, grab started by request is used by it, stop until next request if nobody asks for frames
+        while grab_request_time < started:
+            capture_event.clear()
+            try:
+                await asyncio.wait_for(capture_event.wait(), CAPTURE_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+
+        # Grab rate follows request rate up to MAX_CAPTURE_FPS, grab completes half of capture period before expected request to absorb jitter
+        next_start = max(started + 1.0 / MAX_CAPTURE_FPS, grab_request_time + grab_request_interval - grab_duration - 0.5 / MAX_CAPTURE_FPS)
+        await asyncio.sleep(max(0.0, next_start - time.monotonic()))
+
+        # Request could start grab by itself while waiting
+        if grab_future is future:
+            start_grab(time.monotonic())
+
+
+async def grab_screen_shared() -> numpy.ndarray:
+    """
+    Get latest screen grab shared for all connections. Returned image is
+    shared between connections and must not be modified in place
+    """
+
+    global capture_task, capture_event, grab_request_time, grab_request_interval
+
+    now = time.monotonic()
+
+    # Average interval between requests of all connections, first request after idle has no interval
+    if now - grab_request_time < CAPTURE_IDLE_TIMEOUT:
+        if grab_request_interval == 0.0:
+            grab_request_interval = now - grab_request_time
+        else:
+            grab_request_interval += (now - grab_request_time - grab_request_interval) * CAPTURE_INTERVAL_EWMA
+    grab_request_time = now
+
+    # Grab in progress is newer than last grab
+    if grab_future is not None and not grab_future.done():
+        future = grab_future
+
+    # Last grab is not older than new grab would take
+    elif grab_result is not None and now - grab_result_time < max(1.0 / MAX_CAPTURE_FPS, grab_duration):
+        future = None
+
+    else:
+        future = start_grab(now)
+
+    if capture_task is None or capture_task.done():
+        capture_event = asyncio.Event()
+        capture_task = asyncio.create_task(capture_loop())
+    capture_event.set()
+
+    if future is None:
+        return grab_result
+
+    # Cancelled request must not cancel grab for others
+    return await asyncio.shield(future)
+
+
+@functools.lru_cache(maxsize=16)
+def fit_size(width: int, height: int, max_width: int, max_height: int) -> tuple:
+    """
+    Get size fitting into max size with aspect ratio preserved, geometry
+    rarely changes between frames so results are cached
+    """
+
+    scale = min(max_width / width, max_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fit_image(image: numpy.ndarray, max_width: int, max_height: int, quality: int) -> numpy.ndarray:
+    """
+    Downscale BGRA image to fit into max size, grabbed image is shared and can not be resized in place
+    """
+
+    height, width = image.shape[:2]
+
+    if width <= max_width and height <= max_height:
+        return image
+
+    size = fit_size(width, height, max_width, max_height)
+
+    # OpenCV resize kernels are vectorized, area averaging is used for strong downscale and has fast path for integer factors
+    if cv2 is not None:
+        if width / size[0] >= DOWNSAMPLE_BOX_MIN_FACTOR:
+            interpolation = cv2.INTER_AREA
+        else:
+            interpolation = cv2.INTER_LINEAR
+
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    if width / size[0] >= DOWNSAMPLE_BOX_MIN_FACTOR and quality < DOWNSAMPLE_BOX_MAX_QUALITY:
+        resample = DOWNSAMPLE_BOX
+    else:
+        resample = DOWNSAMPLE
+
+    # Resize does not depend on channel order, wrap BGRA as RGBX without copy
+    wrapped = PIL.Image.frombuffer('RGBX', (width, height), numpy.ascontiguousarray(image), 'raw', 'RGBX', 0, 1)
+    return numpy.asarray(wrapped.resize(size, resample, reducing_gap=DOWNSAMPLE_REDUCING_GAP))
+
+
+def frame_hash(image: numpy.ndarray) -> int:
+    """
+    Hash full-resolution frame contents, None if xxhash is not available
+    """
+
+    if xxhash is None:
+        return None
+
+    return xxhash.xxh3_64_intdigest(numpy.ascontiguousarray(image))
+
+
+def pixel_words(image: numpy.ndarray) -> numpy.ndarray:
+    """
+    View BGRA image as (height, width) array of uint32 pixels, no copy for contiguous image
+    """
+
+    return numpy.ascontiguousarray(image).view(numpy.uint32).reshape(image.shape[:2])
+
+
+if numba is not None:
+
+    # Kernels are called from several capture threads, workqueue layer aborts process on concurrent launch
+    numba.config.THREADING_LAYER = 'threadsafe'
+
+    # Grabbed & resized frames can be read-only buffers, explicit read-only signatures compile kernels once on import for any frame
+    frame_pixels = numba.types.Array(numba.uint32, 2, 'C', readonly=True)
+
+    @numba.njit(inline='always')
+    def pixel_changed(last_pixel, pixel, threshold):
+        """
+        Check if any color channel of pixel differs by more than threshold
+        """
+
+        if threshold == 0:
+            return (last_pixel ^ pixel) & PIXEL_COLOR_MASK != 0
+
+        for shift in (0, 8, 16):
+            if abs(int((last_pixel >> shift) & 0xFF) - int((pixel >> shift) & 0xFF)) > threshold:
+                return True
+
+        return False
+
+    @numba.njit(numba.void(frame_pixels, frame_pixels, numba.int64[::1], numba.int64, numba.int64[::1], numba.int64[::1]), parallel=True, boundscheck=False)
+    def diff_rows_kernel(last_pixels, pixels, rows, threshold, row_left, row_right):
+        """
+        Find first & last changed column of each candidate row, -1 for row
+        with padding-only or below threshold change. Rows are scanned in
+        parallel, scan stops at first changed pixel from each side
+        """
+
+        width = pixels.shape[1]
+
+        for i in numba.prange(rows.size):
+            y = rows[i]
+
+            left = -1
+            for x in range(width):
+                if pixel_changed(last_pixels[y, x], pixels[y, x], threshold):
+                    left = x
+                    break
+
+            right = left
+            if left >= 0:
+                for x in range(width - 1, left, -1):
+                    if pixel_changed(last_pixels[y, x], pixels[y, x], threshold):
+                        right = x
+                        break
+
+            row_left[i] = left
+            row_right[i] = right
+
+    @numba.njit(numba.void(frame_pixels, frame_pixels, numba.int64[::1], numba.int64, numba.int64, numba.boolean[::1]), parallel=True, boundscheck=False)
+    def diff_columns_kernel(last_pixels, pixels, rows, threshold, left, columns):
+        """
+        Mark changed columns of band starting from left column. Chunks of
+        columns are scanned in parallel, scan stops when all columns of chunk
+        are marked
+        """
+
+        for chunk in numba.prange((columns.size + 63) // 64):
+            start = chunk * 64
+            end = min(start + 64, columns.size)
+            remaining = end - start
+
+            for y in rows:
+                for x in range(start, end):
+                    if not columns[x] and pixel_changed(last_pixels[y, left + x], pixels[y, left + x], threshold):
+                        columns[x] = True
+                        remaining -= 1
+
+                if remaining == 0:
+                    break
+
+else:
+    diff_rows_kernel = None
+    diff_columns_kernel = None
+
+
+def split_band(columns: numpy.ndarray, left: int, top: int, bottom: int, regions: list):
+    """
+    Append regions of band split on long unchanged column gaps
+    """
+
+    columns = numpy.flatnonzero(columns)
+    ends = numpy.append(numpy.flatnonzero(numpy.diff(columns) > DIRTY_REGION_GAP) + 1, columns.size)
+
+    start = 0
+    for end in ends:
+        regions.append((left + int(columns[start]), top, left + int(columns[end - 1]) + 1, bottom))
+        start = end
+
+
+def diff_regions(last_frame: numpy.ndarray, frame: numpy.ndarray) -> list:
+    """
+    Get bounding boxes (left, top, right, bottom) of changed areas, split into
+    horizontal bands and then by columns, empty list if frames are equal
+    """
+
+    last_pixels = pixel_words(last_frame)
+    pixels = pixel_words(frame)
+
+    # Whole pixel compare is one word op per pixel instead of strided per-channel compare
+    rows = numpy.flatnonzero((last_pixels != pixels).any(axis=1))
+    if rows.size == 0:
+        return []
+
+    if diff_rows_kernel is not None:
+
+        # Column bounds of candidate rows without boolean temporaries
+        row_left = numpy.empty(rows.size, dtype=numpy.int64)
+        row_right = numpy.empty(rows.size, dtype=numpy.int64)
+        diff_rows_kernel(last_pixels, pixels, rows, diff_threshold, row_left, row_right)
+
+        changed_rows = row_left >= 0
+        rows = rows[changed_rows]
+        row_left = row_left[changed_rows]
+        row_right = row_right[changed_rows]
+        if rows.size == 0:
+            return []
+
+        # Split changed rows into bands on long unchanged gaps
+        ends = numpy.append(numpy.flatnonzero(numpy.diff(rows) > DIRTY_REGION_GAP) + 1, rows.size)
+
+        regions = []
+        start = 0
+        for end in ends:
+            left = int(row_left[start:end].min())
+            right = int(row_right[start:end].max()) + 1
+
+            # Single changed column range can not be split
+            if right - left <= DIRTY_REGION_GAP + 1:
+                regions.append((left, int(rows[start]), right, int(rows[end - 1]) + 1))
+            else:
+                columns = numpy.zeros(right - left, dtype=numpy.bool_)
+                diff_columns_kernel(last_pixels, pixels, rows[start:end], diff_threshold, left, columns)
+                split_band(columns, left, int(rows[start]), int(rows[end - 1]) + 1, regions)
+
+            start = end
+
+        return regions
+
+    # Fourth byte is padding, recheck color bytes on candidate rows only
+    if diff_threshold == 0:
+        changed = ((last_pixels[rows] ^ pixels[rows]) & PIXEL_COLOR_MASK) != 0
+    else:
+
+        # Absolute difference without widening, channel flags are checked as one word per pixel
+        last_rows = last_frame[rows]
+        frame_rows = frame[rows]
+        difference = numpy.maximum(last_rows, frame_rows)
+        difference -= numpy.minimum(last_rows, frame_rows)
+        changed = (pixel_words(difference > diff_threshold) & PIXEL_COLOR_MASK) != 0
+    changed_rows = changed.any(axis=1)
+    rows = rows[changed_rows]
+    changed = changed[changed_rows]
+    if rows.size == 0:
+        return []
+
+    # Split changed rows into bands on long unchanged gaps
+    ends = numpy.append(numpy.flatnonzero(numpy.diff(rows) > DIRTY_REGION_GAP) + 1, rows.size)
+
+    regions = []
+    start = 0
+    for end in ends:
+
+        split_band(changed[start:end].any(axis=0), 0, int(rows[start]), int(rows[end - 1]) + 1, regions)
+        start = end
+
+    return regions
+
+
+def merge_regions(regions: list) -> list:
+    """
+    Merge regions pairwise with least extra area until MAX_DIRTY_REGIONS are
+    left, regions are (left, top, right, bottom) sorted by top
+    """
+
+    if len(regions) <= MAX_DIRTY_REGIONS:
+        return regions
+
+    if len(regions) > MAX_MERGED_REGIONS:
+        return [ (min(r[0] for r in regions), regions[0][1], max(r[2] for r in regions), regions[-1][3]) ]
+
+    boxes = numpy.array(regions, dtype=numpy.int64)
+    while len(boxes) > MAX_DIRTY_REGIONS:
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        # Area added by merging each pair into their bounding box
+        union = (numpy.maximum.outer(boxes[:, 2], boxes[:, 2]) - numpy.minimum.outer(boxes[:, 0], boxes[:, 0])) * \
+                (numpy.maximum.outer(boxes[:, 3], boxes[:, 3]) - numpy.minimum.outer(boxes[:, 1], boxes[:, 1]))
+        extra = union - area[:, None] - area[None, :]
+        numpy.fill_diagonal(extra, numpy.iinfo(numpy.int64).max)
+
+        i, j = numpy.unravel_index(numpy.argmin(extra), extra.shape)
+        boxes[i] = (min(boxes[i, 0], boxes[j, 0]), min(boxes[i, 1], boxes[j, 1]), max(boxes[i, 2], boxes[j, 2]), max(boxes[i, 3], boxes[j, 3]))
+        boxes = numpy.delete(boxes, j, axis=0)
+
+    boxes = boxes[numpy.lexsort((boxes[:, 0], boxes[:, 1]))]
+    return [ tuple(int(v) for v in box) for box in boxes ]
+
+
+def detect_scroll(last_frame: numpy.ndarray, frame: numpy.ndarray, bbox: tuple) -> int:
+    """
+    Get vertical offset of contents moved inside changed bounding box, 0 if
+    there is no scroll
+    """
+
+    left, top, right, bottom = bbox
+    if bottom - top < SCROLL_MIN_HEIGHT:
+        return 0
+
+    # Row signature is weighted sum of sampled pixels, wraps around on overflow
+    step = -(-(right - left) // SCROLL_SIGNATURE_COLUMNS)
+    last_sample = pixel_words(last_frame)[top:bottom, left:right:step] & PIXEL_COLOR_MASK
+    sample = pixel_words(frame)[top:bottom, left:right:step] & PIXEL_COLOR_MASK
+    weights = scroll_signature_weights[:sample.shape[1]]
+    last_signature = (last_sample.astype(numpy.uint64) * weights).sum(axis=1)
+    signature = (sample.astype(numpy.uint64) * weights).sum(axis=1)
+
+    # Only rows unique in both frames give unambiguous offset, blank rows match anywhere
+    last_values, last_rows, last_counts = numpy.unique(last_signature, return_index=True, return_counts=True)
+    values, rows, counts = numpy.unique(signature, return_index=True, return_counts=True)
+    last_unique = last_counts == 1
+    unique = counts == 1
+    _, last_index, index = numpy.intersect1d(last_values[last_unique], values[unique], assume_unique=True, return_indices=True)
+
+    # Most common non-zero offset wins
+    offsets = rows[unique][index] - last_rows[last_unique][last_index]
+    offsets = offsets[offsets != 0]
+    if offsets.size < SCROLL_MIN_ROWS:
+        return 0
+
+    offset_values, offset_counts = numpy.unique(offsets, return_counts=True)
+    best = offset_counts.argmax()
+    if offset_counts[best] < SCROLL_MIN_ROWS:
+        return 0
+
+    return int(offset_values[best])
+
+
+def encode_jpeg(image: numpy.ndarray, quality: int, fp: BytesIO):
+    """
+    Encode BGRA image into JPEG with libjpeg-turbo or Pillow as fallback,
+    output is appended to fp
+    """
+
+    if turbo_jpeg is not None:
+        fp.write(turbo_jpeg.encode(image, quality=quality, pixel_format=turbojpeg.TJPF_BGRX, jpeg_subsample=jpeg_subsampling, flags=turbojpeg.TJFLAG_FASTDCT))
+        return
+
+    height, width = image.shape[:2]
+
+    # Pillow writes directly into frame buffer, no intermediate copy
+    PIL.Image.frombuffer('RGB', (width, height), numpy.ascontiguousarray(image), 'raw', 'BGRX', 0, 1).save(fp=fp, format='JPEG', quality=quality, subsampling=jpeg_subsampling, optimize=False, progressive=False)
+
+
+def encode_webp(image: numpy.ndarray, quality: int, fp: BytesIO):
+    """
+    Encode BGRA image into lossy WebP with Pillow, method=0 is the fastest preset,
+    output is appended to fp
+    """
+
+    height, width = image.shape[:2]
+
+    PIL.Image.frombuffer('RGB', (width, height), numpy.ascontiguousarray(image), 'raw', 'BGRX', 0, 1).save(fp=fp, format='WEBP', quality=quality, method=0)
+
+
+def encode_frame(image: numpy.ndarray, quality: int, codec: str, fp: BytesIO):
+    """
+    Encode BGRA image with selected codec, output is appended to fp
+    """
+
+    if codec == 'webp':
+        encode_webp(image, quality, fp)
+    else:
+        encode_jpeg(image, quality, fp)
+
+
+def encode_regions(image: numpy.ndarray, regions: list, quality: int, codec: str, fp: BytesIO):
+    """
+    Encode regions of BGRA image with region headers, output is appended to fp
+    """
+
+    for region in regions:
+
+        # Reserve length, write body & patch length
+        header_offset = fp.tell()
+        fp.write(REGION_HEADER.pack(region[0], region[1], region[2] - region[0], region[3] - region[1], 0))
+        encode_frame(image[region[1]:region[3], region[0]:region[2]], quality, codec, fp)
+        end_offset = fp.tell()
+        fp.seek(header_offset + 8)
+        fp.write(encode_int32(end_offset - header_offset - REGION_HEADER.size))
+        fp.seek(end_offset)
+
+
+def create_h264_encoder(width: int, height: int, quality: int):
+    """
+    Open first available low-latency H.264 encoder for given frame size, None
+    if there is no working encoder
+    """
+
+    # Map quality [1, 100] to constant quality [51, 18], lower is better
+    constant_quality = str(round(51 - (quality - 1) * 33 / 99))
+
+    for name, options, quality_option in H264_ENCODERS:
+        try:
+            encoder = av.CodecContext.create(name, 'w')
+            encoder.width = width
+            encoder.height = height
+            encoder.pix_fmt = 'yuv420p'
+            encoder.time_base = fractions.Fraction(1, MAX_CAPTURE_FPS)
+            encoder.gop_size = H264_GOP_SIZE
+            encoder.max_b_frames = 0
+            encoder.options = { **options, quality_option: constant_quality }
+            encoder.open()
+            return encoder
+        except (av.error.FFmpegError, ValueError):
+            continue
+
+    return None
+
+
+def encode_h264(encoder, image: numpy.ndarray, pts: int) -> list:
+    """
+    Encode BGRA image into list of Annex B packets, packets expose buffer
+    protocol and can be written without copy
+    """
+
+    frame = av.VideoFrame.from_ndarray(numpy.ascontiguousarray(image), format='bgra')
+    frame.pts = pts
+
+    return encoder.encode(frame)
+
+
+def input_mouse_move(x: int, y: int):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+    else:
+        pyautogui.moveTo(x, y)
+
+
+def input_mouse_button(x: int, y: int, button: int, down: bool):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+        mouse_input.mi.mouseData = 0
+        mouse_input.mi.dwFlags = MOUSEEVENTF_BUTTONS[button][0 if down else 1]
+        user32.SendInput(1, ctypes.byref(mouse_input), mouse_input_size)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+        if down:
+            pynput_mouse.press(pynput_buttons[button])
+        else:
+            pynput_mouse.release(pynput_buttons[button])
+    elif down:
+        pyautogui.mouseDown(x, y, button=MOUSE_BUTTONS[button])
+    else:
+        pyautogui.mouseUp(x, y, button=MOUSE_BUTTONS[button])
+
+
+def input_mouse_scroll(x: int, y: int, dy: int):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+        mouse_input.mi.mouseData = dy & 0xFFFFFFFF
+        mouse_input.mi.dwFlags = MOUSEEVENTF_WHEEL
+        user32.SendInput(1, ctypes.byref(mouse_input), mouse_input_size)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+        pynput_mouse.scroll(0, dy)
+    else:
+        pyautogui.scroll(dy, x, y)
+
+
+def input_key(key: str, down: bool):
+    if pynput_keyboard is not None:
+
+        # Single characters are typed by pynput as is
+        pynput_key = key if len(key) == 1 else pynput_keys.get(key)
+        if pynput_key is not None:
+            if down:
+                pynput_keyboard.press(pynput_key)
+            else:
+                pynput_keyboard.release(pynput_key)
+            return
+
+    if down:
+        pyautogui.keyDown(key)
+    else:
+        pyautogui.keyUp(key)
+
+
 async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.StreamResponse:
     """
     WebSocket endpoint for input & control data stream
     """
 
     # Check access
-    access = (args.password == request.query.get('password', '').strip())
+    access = check_access(request, view=False)
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } [{ "INPUT" if access else "NO ACCESS" }] { request.path_qs }')
+    log_request(request, 'INPUT' if access else 'NO ACCESS')
 
-    # Open socket
-    ws = aiohttp.web.WebSocketResponse()
+    # Open socket, input messages are too small for permessage-deflate
+    ws = aiohttp.web.WebSocketResponse(compress=False, heartbeat=WS_HEARTBEAT)
     await ws.prepare(request)
 
     # Close with error code on no access
@@ -116,11 +1113,90 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
     def release_keys():
         for k in state_keys.keys():
             if state_keys[k]:
-                pyautogui.keyUp(k)
+                input_key(k, False)
 
     def update_key_state(key, state):
         state_keys[key] = state
 
+    # Input event handlers
+
+    def mouse_position(event):
+        # Validate & clamp into screen bounds, inline compare instead of min/max calls
+        mouse_x = int(event[1])
+        mouse_y = int(event[2])
+        return (0 if mouse_x < 0 else real_width if mouse_x > real_width else mouse_x), (0 if mouse_y < 0 else real_height if mouse_y > real_height else mouse_y)
+
+    def mouse_move(event):
+        mouse_x, mouse_y = mouse_position(event)
+
+        input_mouse_move(mouse_x, mouse_y)
+
+    def mouse_down(event):
+        mouse_x, mouse_y = mouse_position(event)
+        button = event[3]
+
+        # Allow only left, middle, right
+        if not 0 <= button <= 2:
+            return
+
+        input_mouse_button(mouse_x, mouse_y, button, True)
+
+    def mouse_up(event):
+        mouse_x, mouse_y = mouse_position(event)
+        button = event[3]
+
+        # Allow only left, middle, right
+        if not 0 <= button <= 2:
+            return
+
+        input_mouse_button(mouse_x, mouse_y, button, False)
+
+    def mouse_scroll(event):
+        mouse_x, mouse_y = mouse_position(event)
+        dy = int(event[3])
+
+        input_mouse_scroll(mouse_x, mouse_y, dy)
+
+    def key_down(event):
+        keycode = event[1]
+
+        input_key(keycode, True)
+        update_key_state(keycode, True)
+
+    def key_up(event):
+        keycode = event[1]
+
+        input_key(keycode, False)
+        update_key_state(keycode, False)
+
+    # Event type to handler
+    input_handlers = {
+        INPUT_EVENT_MOUSE_MOVE:   mouse_move,
+        INPUT_EVENT_MOUSE_DOWN:   mouse_down,
+        INPUT_EVENT_MOUSE_UP:     mouse_up,
+        INPUT_EVENT_MOUSE_SCROLL: mouse_scroll,
+        INPUT_EVENT_KEY_DOWN:     key_down,
+        INPUT_EVENT_KEY_UP:       key_up,
+    }
+
+    def handle_input_events(data: list):
+        """
+        Apply batch of input events, called in input thread
+        """
+
+        # Iterate events, drop unknown
+        for event in coalesce_input_events(data):
+
+            # Drop malformed event without dropping the rest of batch
+            try:
+                handler = input_handlers.get(event[0])
+                if handler is None:
+                    continue
+
+                handler(event)
+            except (IndexError, KeyError, TypeError, ValueError):
+                traceback.print_exc()
+
     # Read stream
     async def async_worker():
 
@@ -138,58 +1214,20 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
                             continue
 
                         # Parse params
-                        packet_type = decode_int8(msg.data[0:1])
+                        packet_type = msg.data[0]
                         payload = msg.data[1:]
 
-                        # Input request
-                        if packet_type == 0x03:
+                        # Input request, JSON or binary
+                        if packet_type == 0x03 or packet_type == 0x04:
 
                             # Unpack events data
-                            data = json.loads(bytes.decode(payload, encoding='ascii'))
-
-                            # Iterate events
-                            for event in data:
-                                if event[0] == INPUT_EVENT_MOUSE_MOVE: # mouse position
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-
-                                    pyautogui.moveTo(mouse_x, mouse_y)
-                                elif event[0] == INPUT_EVENT_MOUSE_DOWN: # mouse down
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    button = event[3]
-
-                                    # Allow only left, middle, right
-                                    if button < 0 or button > 2:
-                                        continue
-
-                                    pyautogui.mouseDown(mouse_x, mouse_y, button=[ 'left', 'middle', 'right' ][button])
-                                elif event[0] == INPUT_EVENT_MOUSE_UP: # mouse up
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    button = event[3]
-
-                                    # Allow only left, middle, right
-                                    if button < 0 or button > 2:
-                                        continue
-
-                                    pyautogui.mouseUp(mouse_x, mouse_y, button=[ 'left', 'middle', 'right' ][button])
-                                elif event[0] == INPUT_EVENT_MOUSE_SCROLL: # mouse scroll
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    dy = int(event[3])
-
-                                    pyautogui.scroll(dy, mouse_x, mouse_y)
-                                elif event[0] == INPUT_EVENT_KEY_DOWN: # keypress
-                                    keycode = event[1]
-
-                                    pyautogui.keyDown(keycode)
-                                    update_key_state(keycode, True)
-                                elif event[0] == INPUT_EVENT_KEY_UP: # keypress
-                                    keycode = event[1]
-
-                                    pyautogui.keyUp(keycode)
-                                    update_key_state(keycode, False)
+                            if packet_type == 0x03:
+                                data = json_loads(payload)
+                            else:
+                                data = decode_input_events(payload)
+
+                            # Blocking input calls do not stall event loop, batch is awaited to keep order
+                            await asyncio.get_running_loop().run_in_executor(input_pool, handle_input_events, data)
                     except:
                         traceback.print_exc()
                 elif msg.type == aiohttp.WSMsgType.ERROR:
@@ -200,7 +1238,7 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
     await async_worker()
 
     # Release stuck keys
-    release_keys()
+    await asyncio.get_running_loop().run_in_executor(input_pool, release_keys)
 
     return ws
 
@@ -211,15 +1249,13 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
     """
 
     # Check access
-    access = (args.password == request.query.get('password', '').strip()) or (args.view_password == request.query.get('password', '').strip())
+    access = check_access(request, view=True)
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } [{ "VIEW" if access else "NO ACCESS" }] { request.path_qs }')
+    log_request(request, 'VIEW' if access else 'NO ACCESS')
 
-    # Open socket
-    ws = aiohttp.web.WebSocketResponse()
+    # Open socket, frames are already compressed and permessage-deflate would only add a pass over every frame
+    ws = aiohttp.web.WebSocketResponse(compress=False, heartbeat=WS_HEARTBEAT)
     await ws.prepare(request)
 
     # Close with error code on no access
@@ -227,22 +1263,225 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
         await ws.close(code=4001, message=b'Unauthorized')
         return ws
 
-    # Frame buffer
-    buffer = BytesIO()
+    # Let full frame fit into write buffer without waiting for drain
+    if request.transport is not None:
+        request.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+
+    # Last screen frame
+    last_frame = None
+    # Track count of partial frames send since last full repaint frame send and prevent firing full frames on low internet
+    partial_frames_since_last_full_repaint_frame = 0
+    # Track count of empty frames send since last full repaint frame send and prevent firing full frames on low internet
+    empty_frames_since_last_full_repaint_frame = 0
+
+    # Store remote viewport size to force-push full repaint
+    viewport_width = 0
+    viewport_height = 0
+
+    # Source of last sent frame, unchanged source gives empty frame without resize & diff
+    last_source = None
+    last_source_hash = None
+
+    # Client sets h264=1 query param if it has WebCodecs decoder, otherwise JPEG is sent. H.264 frames have own frame type 0x03
+    codec = args.codec
+    if codec == 'h264' and request.query.get('h264') != '1':
+        codec = 'jpeg'
+
+    # H.264 encoder, recreated on frame size change, quality is set once per encoder to avoid keyframe on every adaptive quality step
+    h264_encoder = None
+    h264_pts = 0
+
+    def produce_frame(image: numpy.ndarray, req_viewport_width: int, req_viewport_height: int, quality: int) -> memoryview:
+        """
+        Resize, compare with last frame & encode, called in capture thread
+        """
+
+        nonlocal last_frame, partial_frames_since_last_full_repaint_frame, empty_frames_since_last_full_repaint_frame, viewport_width, viewport_height
+        nonlocal codec, h264_encoder, h264_pts, last_source, last_source_hash
+
+        # Frame response header is written in one piece with real dimensions and frame type
+        buffer = BytesIO()
+        real_frame_height, real_frame_width = image.shape[:2]
+
+        # Same shared grab or same screen contents as last time, skip resize, diff & encode
+        source_hash = None if image is last_source else frame_hash(image)
+        if last_source is not None and \
+                viewport_width == req_viewport_width and \
+                viewport_height == req_viewport_height and \
+                empty_frames_since_last_full_repaint_frame <= MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT and \
+                (image is last_source or (source_hash is not None and source_hash == last_source_hash and image.shape == last_source.shape)):
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+            empty_frames_since_last_full_repaint_frame += 1
 
-    # Read stream
-    async def async_worker():
+            return buffer.getbuffer()
+
+        if image is not last_source:
+            last_source = image
+            last_source_hash = source_hash
+
+        # Resize
+        image = fit_image(image, req_viewport_width, req_viewport_height, quality)
+
+        # H.264 does inter-frame diff by itself
+        if codec == 'h264':
+
+            # yuv420p requires even size
+            image = image[:image.shape[0] & ~1, :image.shape[1] & ~1]
+            height, width = image.shape[:2]
+
+            if h264_encoder is None or h264_encoder.width != width or h264_encoder.height != height:
+                h264_encoder = create_h264_encoder(width, height, quality)
+                h264_pts = 0
+
+            # Fall back to JPEG if no encoder available
+            if h264_encoder is None:
+                print('No H.264 encoder available, falling back to JPEG')
+                codec = 'jpeg'
+            else:
+                packets = encode_h264(h264_encoder, image, h264_pts)
+                h264_pts += 1
+
+                viewport_width = req_viewport_width
+                viewport_height = req_viewport_height
+                empty_frames_since_last_full_repaint_frame = 0
+
+                # Encoder has not produced output yet
+                if len(packets) == 0:
+                    buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+                    return buffer.getbuffer()
+
+                buffer.write(FRAME_HEADER_H264.pack(0x02, real_frame_width, real_frame_height, 0x03, 0x01 if any(packet.is_keyframe for packet in packets) else 0x00))
+                for packet in packets:
+                    buffer.write(packet)
+
+                return buffer.getbuffer()
+
+        # Check if this is first frame of should force repaint full surface
+        if last_frame is None or \
+                last_frame.shape != image.shape or \
+                viewport_width != req_viewport_width or \
+                viewport_height != req_viewport_height or \
+                partial_frames_since_last_full_repaint_frame > MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT or \
+                empty_frames_since_last_full_repaint_frame > MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT:
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x01))
+
+            # Write body
+            encode_frame(image, quality, codec, buffer)
+            last_frame = image
+
+            viewport_width = req_viewport_width
+            viewport_height = req_viewport_height
+            partial_frames_since_last_full_repaint_frame = 0
+            empty_frames_since_last_full_repaint_frame = 0
+
+            return buffer.getbuffer()
+
+        # Compare frames
+        regions = diff_regions(last_frame, image)
+
+        # Send nop
+        if len(regions) == 0:
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+            empty_frames_since_last_full_repaint_frame += 1
+
+            return buffer.getbuffer()
+
+        bbox = (min(r[0] for r in regions), regions[0][1], max(r[2] for r in regions), regions[-1][3])
+
+        # Scrolled contents are moved by client, only rows scrolled in are encoded
+        scroll = detect_scroll(last_frame, image, bbox)
+        if scroll != 0:
+            scroll_height = bbox[3] - bbox[1] - abs(scroll)
+            src_y = bbox[1] if scroll > 0 else bbox[1] - scroll
+            dst_y = src_y + scroll
+
+            # Diff against frame as it looks on client after copy
+            scrolled_frame = last_frame.copy()
+            scrolled_frame[dst_y:dst_y + scroll_height, bbox[0]:bbox[2]] = last_frame[src_y:src_y + scroll_height, bbox[0]:bbox[2]]
+            scroll_regions = diff_regions(scrolled_frame, image)
+
+            if sum((r[2] - r[0]) * (r[3] - r[1]) for r in scroll_regions) < SCROLL_MAX_AREA * sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions):
 
-        # Last screen frame
-        last_frame = None
-        # Track count of partial frames send since last full repaint frame send and prevent firing full frames on low internet
-        partial_frames_since_last_full_repaint_frame = 0
-        # Track count of empty frames send since last full repaint frame send and prevent firing full frames on low internet
-        empty_frames_since_last_full_repaint_frame = 0
+                scroll_regions = merge_regions(scroll_regions)
+
+                buffer.write(FRAME_HEADER_SCROLL.pack(0x02, real_frame_width, real_frame_height, 0x05, bbox[0], src_y, bbox[2] - bbox[0], scroll_height, bbox[0], dst_y, len(scroll_regions)))
+                encode_regions(image, scroll_regions, quality, codec, buffer)
 
-        # Store remote viewport size to force-push full repaint
-        viewport_width = 0
-        viewport_height = 0
+                last_frame = image
+                partial_frames_since_last_full_repaint_frame += 1
+
+                return buffer.getbuffer()
+
+        # Send separate regions if they are small compared to their bounding box
+        regions = merge_regions(regions)
+        if len(regions) > 1 and \
+                sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions) < MAX_DIRTY_REGIONS_AREA * (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]):
+            buffer.write(FRAME_HEADER_REGIONS.pack(0x02, real_frame_width, real_frame_height, 0x04, len(regions)))
+            encode_regions(image, regions, quality, codec, buffer)
+
+            last_frame = image
+            partial_frames_since_last_full_repaint_frame += 1
+
+        # Send partial repaint region
+        else:
+            buffer.write(FRAME_HEADER_PARTIAL.pack(0x02, real_frame_width, real_frame_height, 0x02, bbox[0], bbox[1]))
+
+            # Write body, crop is a view without copy
+            cropped = image[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+            encode_frame(cropped, quality, codec, buffer)
+            last_frame = image
+            partial_frames_since_last_full_repaint_frame += 1
+
+        # Expose written bytes without copy
+        return buffer.getbuffer()
+
+    # Latest frame request, requests arriving while frame is produced replace older ones
+    frame_request = None
+    frame_request_event = asyncio.Event()
+
+    # Frame produced in capture thread, can not be interrupted by worker cancel
+    frame_future: asyncio.Future = None
+
+    async def frame_worker():
+        """
+        Produce frame for latest request, runs while socket is open
+        """
+
+        global real_width, real_height
+        nonlocal frame_future
+
+        while True:
+            await frame_request_event.wait()
+            frame_request_event.clear()
+
+            try:
+                req_viewport_width, req_viewport_height, quality = frame_request
+
+                # Client can not keep up with sent data, skip frame and let diff catch up later
+                if request.transport is not None and request.transport.get_write_buffer_size() > MAX_WRITE_BUFFER_SIZE:
+                    await ws.send_bytes(FRAME_HEADER.pack(0x02, real_width, real_height, 0x00))
+                    continue
+
+                # Grab frame
+                image = await grab_screen_shared()
+
+                # Real dimensions
+                real_height, real_width = image.shape[:2]
+
+                # Resize, diff & encode off the event loop, shielded so disconnect can wait for it
+                frame_future = asyncio.get_running_loop().run_in_executor(capture_pool, produce_frame, image, req_viewport_width, req_viewport_height, quality)
+                frame = await asyncio.shield(frame_future)
+
+                # Slow send delays frame on client, client adaptive quality reacts to it
+                await ws.send_bytes(frame)
+
+            # Cancellation on disconnect is not an error
+            except Exception:
+                traceback.print_exc()
+
+    # Read stream
+    async def async_worker():
+        nonlocal frame_request
 
         try:
 
@@ -258,79 +1497,12 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
                             continue
 
                         # Parse params
-                        packet_type = decode_int8(msg.data[0:1])
-                        payload = msg.data[1:]
+                        packet_type = msg.data[0]
 
-                        # Frame request
+                        # Frame request, picked up by frame worker
                         if packet_type == 0x01:
-                            req_viewport_width = decode_int16(payload[0:2])
-                            req_viewport_height = decode_int16(payload[2:4])
-                            quality = decode_int8(payload[4:5])
-
-                            # Grab frame
-                            if args.fullscreen:
-                                image = PIL.ImageGrab.grab(bbox=None, include_layered_windows=False, all_screens=True)
-                            else:
-                                image = PIL.ImageGrab.grab()
-
-                            # Real dimensions
-                            global real_width, real_height
-                            real_width, real_height = image.width, image.height
-
-                            # Resize
-                            if image.width > req_viewport_width or image.height > req_viewport_height:
-                                image.thumbnail((req_viewport_width, req_viewport_height), DOWNSAMPLE)
-
-                            # Write header: frame response
-                            buffer.seek(0)
-                            buffer.write(encode_int8(0x02))
-                            buffer.write(encode_int16(real_width))
-                            buffer.write(encode_int16(real_height))
-
-                            # Compare frames
-                            if last_frame is not None:
-                                diff_bbox = PIL.ImageChops.difference(last_frame, image).getbbox()
-
-                            # Check if this is first frame of should force repaint full surface
-                            if last_frame is None or \
-                                    viewport_width != req_viewport_width or \
-                                    viewport_height != req_viewport_height or \
-                                    partial_frames_since_last_full_repaint_frame > MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT or \
-                                    empty_frames_since_last_full_repaint_frame > MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT:
-                                buffer.write(encode_int8(0x01))
-
-                                # Write body
-                                image.save(fp=buffer, format='JPEG', quality=quality)
-                                last_frame = image
-
-                                viewport_width = req_viewport_width
-                                viewport_height = req_viewport_height
-                                partial_frames_since_last_full_repaint_frame = 0
-                                empty_frames_since_last_full_repaint_frame = 0
-
-                            # Send nop
-                            elif diff_bbox is None :
-                                buffer.write(encode_int8(0x00))
-                                empty_frames_since_last_full_repaint_frame += 1
-
-                            # Send partial repaint region
-                            else:
-                                buffer.write(encode_int8(0x02))
-                                buffer.write(encode_int16(diff_bbox[0])) # crop_x
-                                buffer.write(encode_int16(diff_bbox[1])) # crop_y
-
-                                # Write body
-                                cropped = image.crop(diff_bbox)
-                                cropped.save(fp=buffer, format='JPEG', quality=quality)
-                                last_frame = image
-                                partial_frames_since_last_full_repaint_frame += 1
-
-                            buflen = buffer.tell()
-                            buffer.seek(0)
-                            mbytes = buffer.read(buflen)
-                            buffer.seek(0)
-
-                            await ws.send_bytes(mbytes)
+                            frame_request = FRAME_REQUEST.unpack_from(msg.data, 1)
+                            frame_request_event.set()
 
                     except:
                         traceback.print_exc()
@@ -339,25 +1511,132 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
         except:
             traceback.print_exc()
 
+    frame_task = asyncio.create_task(frame_worker())
+
     await async_worker()
 
+    # Cancel worker, it stops at its current await
+    frame_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await frame_task
+
+    # Frame already running in capture thread still changes session state, wait for it to finish
+    if frame_future is not None:
+        with contextlib.suppress(Exception):
+            await frame_future
+
     return ws
 
 
+async def get__stream(request: aiohttp.web.Request) -> aiohttp.web.StreamResponse:
+    """
+    MJPEG stream endpoint for view-only clients, frame size and rate are set
+    by width, height, quality & fps query params
+    """
+
+    # Check access
+    access = check_access(request, view=True)
+
+    # Log request
+    log_request(request, 'STREAM' if access else 'NO ACCESS')
+
+    if not access:
+        raise aiohttp.web.HTTPUnauthorized()
+
+    # Stream params, zero size means no downscale
+    query = request.query
+    try:
+        max_width = int(query.get('width', 0)) or 65535
+        max_height = int(query.get('height', 0)) or 65535
+        quality = max(1, min(100, int(query.get('quality', 50))))
+        fps = max(1, min(60, int(query.get('fps', 20))))
+    except ValueError:
+        raise aiohttp.web.HTTPBadRequest()
+
+    # WebP only if client accepts it, H.264 can not be sent as multipart
+    codec = 'webp' if args.codec == 'webp' and 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    part_header = b'--frame\r\nContent-Type: image/' + codec.encode() + b'\r\nContent-Length: %d\r\n\r\n'
+
+    def produce_stream_frame(image: numpy.ndarray) -> memoryview:
+        """
+        Resize & encode, called in capture thread
+        """
+
+        buffer = BytesIO()
+        encode_frame(fit_image(image, max_width, max_height, quality), quality, codec, buffer)
+
+        return buffer.getbuffer()
+
+    response = aiohttp.web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+
+    # Frames are paced by absolute deadlines, so send time does not accumulate as drift
+    frame_interval = 1.0 / fps
+    frame_deadline = loop.time()
+
+    try:
+        while True:
+
+            # Grab is shared with other viewers
+            image = await grab_screen_shared()
+            frame = await loop.run_in_executor(capture_pool, produce_stream_frame, image)
+
+            # Write multipart part
+            await response.write(part_header % len(frame))
+            await response.write(frame)
+            await response.write(b'\r\n')
+
+            # Skip missed deadlines instead of sending burst of frames to catch up
+            now = loop.time()
+            frame_deadline = max(frame_deadline + frame_interval, now)
+            await asyncio.sleep(frame_deadline - now)
+    except ConnectionResetError:
+        pass
+
+    return response
+
+
 # Encoded page hoes here
-INDEX_CONTENT = gzip.decompress(base64.b85decode('ABzY8%)fkO0{`ti?RMKXvj6oISa-Lg5=oZi*hwtQds2UFytQMmC8zbx`q-2RT8t@@B`M2lst39E@$Qq{nE^n86e+t&yY1cWIf=y?0E59`FdqQOopC&IcPl$%Zd&jYJF&}m-wp<6=leVB0;=pxcx<xK*bE~c_tq{3hmBWjfR5rh7LQEt-i+9%%FMCi@iuF>T7T(Q#@x9b#|m0ho<RlM_u__aP8@f>%_hF*M}axwU4fs;21DPqumLhw2gsVQCLNfT<#@N-tktbd%<$In=y6f`%5qHCzlGL;A33q(LxDMre0Lf{pDQT-*l;|HKWwwtEg%&80TFb$9n*v5M1gC<2yB->0Q2y-VL2fmi7rOa!NluUK2D?9vFD8u432xybOe8S*sYkZbL%ynm`|b<nX<dfzKX`C<<Gu^@pcj8LvwU@8~Rhv0;XI)+-6_3TCJD4&LzLldrGd;(&XF@`J|ATZQCWZ;E{Am=|JTC$bnFElSqkKYYhE3_9wupM3+&r{cw_3i3QBcebe!RDJYo3T?;BaGEbpDlgL?Uf}}hje+%Y~l(aGA@r-jXk^jhaM+SDz8YGb#h{O*q4uXisj>llS9E*KrnzpW@kBvA#ie2WKL++v~q%=C^wE^?_Bfmvp6)#AAmk|znDbN7U`3f-%{Rf<R8il9?5_stTjG@WSx5xfH50M3=NQ(tJfBDj8t>7X3-xQka!~8k%9Lc}je4MrkQo83ve0dzu$D<TJ#Pfjn)`nA<TyO14Be*QEmoGUfy2s-vHsg{dzy6FVZO0L@XY1+07mHCUl7Pg5mxBjE*)Gaw>{u4+uf71O$~1zBh`0;tfx6&9hnjf+JHj90M9PgeNS6MzXu;Rn5`utyjTENw!s4=>$4oPEw`!oFUi5^Kj;3LR;|hF7Sl!=X=sWAuZSJf~pNlRIexw_9tlpYjzvyGv1sa}E!$cw4#5G1_lDgZ({hC%!+AkeNHW(0lBz+(b1zIs0R_arrbEQHIYs~jXt~0vpt$~=iptMgc88zs?q_NcRv|Qs72xwHJu|Hd)`oI74->P9W3Y{QkVvXVatba5?K!jamW;FLkyA^|enLYK$<T0a$o<~8qJl^yDJBJ&dIpJ6YTtqRuH{B^`J$BP&fBt0oqv-_X*BnvR#Z6b%3d}H$pcd6`g7BT#pcY7M(Ypah;MmNdYE74WxAB<udOg;uRYD$5Lr+j>27X}FWczBj3XfyQj$yc}nm2V_)R=_tDB*jAebw2Bct{6e0b3rQv3)b<NXTkJlYukghSj{4Pc`<O85>)htrmO6IxpbQR!jW>ch;)a(165@KLp@0aG-1QvA6b|S<TqL80_`q5DYeTkrfk4@6VqY@y8ZDd=ye$bm3XiTyz679{1L}mOn8auh)dK8N?d?tm*nA69?NI`%x^Y++>9S`Z4g$C^m5N>&%*l)S%AHAmC=WFJUDW-{oMcZJ(;kxlwJ{PLH)}m3Ryukpy=ThJI*Nk6_86xfiU%vPgQVN($M&o=zv*4yoOnAp--1G6dnJ;tV-V;(;hIs-XK=SypV)+Ha1cXaIvknQL~`b{;qc&~a#b3MD-t=xB}swumsqMw?n#$haAChyok_GzLE{%w~h%0}qihm<2X8<A4(Hn_BP21{K|i(L0_8&iv7_Q?<g8Kas0U_EG(t<GQR5GOE@!fSn8g-h){ih7J@ALOz_1#;_hv`cM!-6`&eAc7b<Uit=2?;|=A%M7#)ih!-KwQ4wQtM6?_!%*IZv#a1G=$wVb-NMRRdROHJj_eir28HbAbGN-YhprmURxEm#Xq_HO>@g74c)k#zy&)OS1u4Pbd-8!I;%hZsqpblB%3B*m@>f_`lMNO$Xd9|1N+GACeK{a2jlpV{VP+CAxU?b}e%7~J3uA<snMKwEOpafw_e#DEstx~49ya<f8wOl#1ikK`9e6?f{LS}GvL7EBiLCjYyFjWOt88(Hg_|pU<KS3L>%9}K;ZwDvGvPR;nk{UATXxdH~#WZeU6H?x+J6?_)fLU{9Ix&tOBn}P|$~}>=WZVpBi{$&8`H_Xj0STb@q-m1TP_K$hzKSBsb-f&3<hu5QFY8%&ZInFashZUD1h5=Mj=vevR;z?$hVbei?)bbee8?5^ZFV~R2<$b1PU!H+0J3MHA4Ep2rsh2LCt1C?5pmbZH6!rmS^|SnA0?W*;02&Nw%A!0FtvccBI!$`t~J3>Zw(qq55GnMouI17tmT@@q)0V}Wh7cf)8WL)Hq!&i8zrV<6OxGdhba%|eX{!Ce{a6Zk-e!k!A2jTqd0aVP*e_1n&M8d?b&sVArN@-_cA0b?IAl{=s<*pYUxB`atxY6MGx^w6m!$(u@)dClpuG2f4ItNr7tQnK*}pHFqcPlRo(nLLxsqpx~UDZ_{g{THF(okhGoWP9hA*RS;$3>xDSB3%2=MXReNi7GxifR6ae<DeZ_Wm*sEFzwa$yrqLxE<2;JVw_QJh%q~PVvFig6EXF<Nl9QHM9J&3HWpeYRZDQzWEu-IdU!*+L(&y}=c@V^A@w7ip+gD|wt(Okfyg3?cDr@;i?JABsnM|T|Uhp=Xdp84S&508C67+_M+%47Ruf9hK2Qx6Jl(~Y>wm-Y`1-&`CIuFuX-&-&O;r5b?!ftFSk;;?GHQvG2HaY;M}aI*!V9YpZh!AFN4H!G6201aKjRw6jZbCeB4QE3%Fv1YTG<zRua@myL;OgG#!S^4k%(|64PcexG1_hE^fw;T=k5qLPGI*#KYv>HhV)mp8<QePKY>7-3!r0=1}w0mrNC31`VS~>(mW3ov$0D{PPG=`Z%dFbgZ*%+0~%9WDRz=Er8Q5zw!e1m+_nNXKr2-_f|l%8Q~n@*@0oUoZ$OSk~96mgbqrzReosYwxyX&R2eXWdJSsRnOQ_e-gkq{Jpun1><s<1t8pZaMpaX0+A1s*(vH`BE2P71&QdNz1#7RcfD0wP<9h!(Tospi<m7WVA&isy&%RIp@wV!nyP1oI9&HujJHQ=^JES`qGU`mu_7w_lR~f9DA;>P+BXRQ4z*RZqTiW=wu97%`~8ViE`Bx*QBI}@J6*`seJ&sOLnll9gqz>s%pPj^^}X4v9C<nYv{Wn81+_{Vr;g}C@Iu-IGRqB)&R@yfux>9XbQ#<GT3Uem!&4`j`QG+i@V{FJ%%`2%Hx2fCr-pOE{9^Pq5@2-D5LqL_QhLurV{NI(;Qjghw)?e3Pzc*mz|MZ{)=&X0so-E5;BaCgQV`ka9-C~Z&zCWu^EB4oOx%`YLdREZWF6a%sc)b$Y$m=Gn?eSAb>m!LH*A;C`c3!`iYpZI22f_p*0r)F3$0vvU39Fa55LJ|D4+(Wz(AXW6B-DFnq^{qO7@heA++QPi=(WXyp14H#GYI&MMV`JXhD(!>Mi4?hlIX0wc0FVQ9{cHU=&7KSsf#Cp~a$J+#1_6j7_QmfXZtDsWBH551h2@whoL9}Mx}c!ms>DgXKoYt`A-=H|v`O+?=rDnfN0CG(c5Ez?onq^P}e;;Bm{2P0c&qR#A~%0y7!Y%JL;Znu$X_sWp`lvUrvu@$Ky?m;&_e}=lCD@X+Sn^8ooDSnn*i?TMHyaKtNiUpPs)Ut>S*>2RcX#jZu?>j#h>%L};g>w9<$Ch*fmxNYP&VR0^m~It$W@r|W)Lla}QK)5lq8@G`zRguy+Az!PIn}f_GH3=zn5O|rFEmiK7D{HclWL<l_c=H+sE=Ds%@$ivqD&FlXrW}9FP!iw!oEz;av`&xM7O`0p}|g}|0bq_Fe<R&-iSj~PR8XMp=i>GQk5n9qZ&)k9GKYeHEv>{TVBePTgj=9Ru8hIhgL`RLt;H23^HqjH42RQBW?!|SQ283Npz#EW9k|c^()BE+cn*ZrYcxabwiGxdMh9NraD#uNI&t~!im<~3W>CoR^+wq8S8+m?evn-;fYzg!VNkAiMYP`s+ZSUF~LSkFB9@EbJkXKHFW)<)QNB4(fB}G(u`bZ#0|)wuj&v|U`t3~oeAjt`p1CZR@p)dY#QPw>c#o7+-eocAixGv#vLnRz!1_zEW12Hia1(AHhs_aO>4=BA@z{o`*#|3=ogx$md_}PM4MJ<&O{%ghx)SNS_j7~<(6XV1*S`{n4&7RYzUU<qed}TBhf>hRw5`ub_=!U7u1)mrYQMG;Rx6Q(LSO*$x0uAoxFZ1UQ%09L#WQYxXvqCXQdXlTmLa?SfEMk6c`FYm#bxwf@v-1mD=x4!5$5M{-qqIp%!YM7AORI>LMv;au2#{(ocF_-m^=?hSPw1DrTTV+}|u}C>d43VIQjgBY7NK)YU=VvM|a>CZU|TE(tlNxQojSnF(^MR@F)8XM0g7;yoO8p^OP=q6s1?zGw+2Na8OXUrjr^sJ`==IT}IO$6{Yxeyb+u79*FNN{B|0Wbw4IM1msu7S>kp?}(0)Mrl$^^J$fIniIQzP_!i8eJ2`e5>8TtMEy`IC9_tbthfv*^G{abaz<~6^WNeq_$%AQW8dxMtXIfFqq^v3@3&MX|1cFGkDG!kH9_dd{>XR5J|FIgMcY;AsXB|IDs%<E;5)Y0*GsPBu*JIU;~G`#dKTT(#BN2p!lds=R-^H+VdSq$!SKqFNMA3`k1$R0Jv{kLvX^wHx`xMf+1zyKcxE^sh&Z=uVj>`t%4)Wr?@dIigS(C;=}*3e4^}QyT{C<6x}?>a%K8E>IHu8>lVX%8TdjCs?U&lHqSd*2$BJ&wY3a{jP`@)LIY8p)Ws|9)&x)nc*8et{;b-{JB8mJPJIYOA<!CdR)Ci9h^ZrZ|MX^J}+Z&nI|Arp!OC1xP_oYsRCC(|gdjCIrCz_|<g?mz*{C57S)S{L+sA79l=AlZKq~>ReeUvyaKYDj|F}OZ>fADT_eR6uyKY+jQ55(<)vKsrR-@U_q$?_T(XHecLFYoW2pC02qtBs;M-yU45K3<fSQxBV}^kX#e&*tCqIbArYto>u^$9!#@tyS0Rm9;Z>8X@o;0hsWKiBKJ(6UP%}4XVgP$F~q{BG`A$XpGQ0Li^6G6Soj-C14xDb^>+~>?Gg@f*T3=0>KvvxQXCq0&XF=m4Gi1e3^i+5PX$@uMvDrJo1Ty*G@gebP;oa#{~%W5c(!0=XlKR7;zs62dGGm?VtbDs-0tgj@T<z?*}Ex8^nNw-ymR0;2Q*n64*mvB!PVdED0PSz$I{qfGvT)A#f{!w+M_SaD;#(fxjd0Q3Bs0a3_Id1Y8N6ATW`@I|MuloFd>$;0%F40{=kZ2ML@b5K5qrKqP?y0<i=x5SU8fJp%U<_zr=Y1inY$K?0Wu%q8$&2>gh^yXhn_tv42FooSK8-nhwpnQn|XgC#bZ9zfIW;AA%O{WzM71fWUvXAuvv0+k66t7xT%=Dj}+otQ^j9UG7Wr&aXBnHgGoEs06%y!9tst1w0|Ed{d!?rE%52qh-1(+7V((yK%Qq1Av0LoY`V*R>f$$G#Zp2%cSE3=`bxJr7B0Bl#$>ap=2B%%eDTm7HZ!B5N#5ge|6PpO2i0SY(!b#Fa@Qra;nDTHm>MEKwq!a5^Chne9VZLTLQOwd;|5xn~I|=AnS`0WlE_jR<k^1h_*oLN-~UL$W|NnV>^5KQ`H)L$W<K8J|NkJT_ULL$W$HnVmy2IX2mxL$WtE8Jt5hHuh`LS4(u(5|Hd#^xYPnw?*%5(S2L=-xdtC1qW@xLR;|A7EH7S7j3~tTkz2qjI;$OZNW-g@X`^ybObLQ!AnQVK?*|f(h<CL1TP)IOGofR^0!I)Z@EjFHO60rr8X-yKJp@|Nsf5J#cX=!i7zJi4xSNrY(fAyeiH=5l1q?@kY3iwly%aw6Vq|ivI#=ysJP{r;`WJFh)D5<MWRwlrIk7h4Lq5;u@ks+GLY(7ksYA%e}^}U(PF}H97-GU&iAzS<3Z4oE+Ijf=D?dyS}Ce6QSB7fk*H3J+K{M?6!k))UZki^iP}t2TN1UEqFzeW%M|rWqF$w_*An$wqLj4&lrk1)5SytriD$NIT_XM>P}pf8aMOqj6h0_np1I~cEdn50OtL-;`Mu+dz$1X?MBZm1q^$yr4+_&Cg`9f{J`$js@x)RkRtoC-uB*lu5u}Eg>QJgUeSGarDGt2@r?iJkk`AaS?Zt(RhS2nY80Cf%7bMhHT5M&i#dP$iLmamtte&BCU=GRGn!{v-Li9rHZ>E;xzsDE+lbO0FNX^x%GOh8+RM=`!VKNo=TB{&B6~&_KGW=;@$qrHxCAkwGn+538ej-i4CbGoZg#|}m>|TnwpVOSnor`43K$jxOPP1D<>9iFVQ&vEC@G)NgaMew&GEoLPh;o-lROt!mEI;w@`BIIEDj}*e1<4##B|8Lk^fm?8@2#MRS##m>C7$!KpMEMnxKxD&<Qq!^*eSSJK^HG8HKw*%@X8Rrv;RF_-PVq{#NCbW)HxX5Aux)M$Z9E(%R(Y=lQXepD(QKd5{cLfKqK@$+wDo-zW$o&_#K6RUUY2t_17AaOGV@|OXN}!xy%z0ELGI|86h{_@6~N8dRxvgbY2>Ql^T1-maayu7qFLz%XBYG$zDpbmpQVDxC%I?w-*zwZwAw7Y<#E`XTS9d4NLr7R<7jzs;ssy>zKB$m{b>*xOlmUvY)?TN@)IaOD5@{Q817{mdzi_rffqeyKw3i@j`GD(xKSQts_l|i&RgpC0Zxw${$}Pa-1Rk?sMCOD3?zD?!_CVet^1a-kNG>Rqf(tuWQNmP#_;Fs#X5b@&8mE$1TachKruXE0uN9@KkRvf<Lr&mDc`SD#^v!6I6t@t?>fZ3HPRZc>3x73aTRCDU)%(7MbAoEZEeg2;xrQe+5<wvXvzisBi9|tD4lQN)ox0W*JvTgeq0LdMs5Yh4jEO<N-HhG=ED?8aY9hMn&n;%N>L|o_1<M2ZgKEOC5^TD`~S2DZQ)2z3Su2^Nr?dNiAU7e>GE8KBJFJl{z}jtH~23h09Qrlh*H*w9*N2U4OoWy5L)pe=GyguCachQskH^Qi+v}EGtC%;%V+KK;esLdil0!g0F9hPY$?%&%TRS@cKV_OZ-YlwayAR5*{Nk8*}ce#>;8dllsRkB1Ix^1)oG<8mQ*k)$~|n=?W&`3V^^$$Dm)ITP6hSSPr7VkU!d#*k3XQ>V^%dp12nAyLg99)EC!q)Ab=<dr%p(R&uRQ$px74<g3cGy)pdYkm))<lH19>wW?FAWnTLuk*$8gE+wq^@8(~z+o%`P6Ze|v)prbe9M7UtdwSSerrTxDpF>e{IXOe?12&SMFwk1!_h$Eil{c}0P0QaR%MeT7A}ilf%)ULAY5tTO*bDu-O`@FjQYTDi?K7HamN0XzDgR-!YQB7%S_CT%q4+Y<m)XKX8b8Y%mUHoRi&#$MX-2WI{b$<6LRwEYjb*J%t>dz}SR~g!i>`Ckx=(ls{K28u$`|U*a{YryPkOOD`voQaz4H7k;L_`-pI_46q}I{;h1FH>Y)g8NzO?-)!+9AjeUEBUWB9YPE<QYo-zk!x@m!}5YX2Xg?vn^tTL1t'.encode())).decode('utf-8')
+INDEX_CONTENT_GZIP = base64.b85decode('ABzY8000000t4+mYggk&vfuqHI%Ib&1!HXUn!%VHGQbWSm>~nqggeUtVYRV>EIE>lac2EP_Wr#4OKw&5LoHb{&SbKAoSc)4Ro&Iq)z$Uthr~`l8Th-Eoj!M5_({CP=ew`Y&rjd(@2m=_vNPa`!@7MZih0smx;Q^vdA<b2aWcW`t`j^sG5c5<dv4O-X3a+9@9j#Tdw2arLDR}tfY1wrWToc}Jb$vy24N7!L#NBzqI@hH+=jl34Un-KK<;Ed>7nDgUU0X~8tux!iSE3B9;cNrUC;5uJ7_%&V=wVSsBmuM&>tnx=NyVZt$2aUAGg_y1`tZZArbU>FQEt5i-*1gBk1}35txU6S6naRUC~7sIv51)$`7MB@p_Y$E)0$b(6kHx@~B;LeD5w;@e)3W)54V9UG`<%cieFNOBin!F@EcG@9&~;6u7{YA4c2k%SNNImFryc3%#f0S`9<a&4>>QiS>HD5?b&`x}<a<_I~0(sJ=m@#H_8{hDj0*fKypqMyVG@gS<*iVOAdMUN9Vif_dC`0pW>xio&rh97hgFDhTnnVBSbcS8jPS<~-2y?>c_h!p_+WNyG+`gptcZ5J}$)7)+PvvM(K{XR7E^BhHUvm-)^u_fZv68m)3{DEah}-ytxM7o@(+s0?~3&;ZW)95LL6k2v!*3V{R?cx?ZSp~=p-`{4tRkOibj#sZyhZS`1V_?Z4*7n&Nv{CUX)$!~2uP1^w}J#ZpEI}YgMNeUm5$&h!JZbvY=!P1pMa8_VjTbvX<;7Ob~Nr}m?e#Mlw<A~T-tEu4&W0Z;{AYt%w@F1w3kMikzu8aC>8X%#JVwi}S`=B1E3juU!xCihf{4vo|UTK14>7ND}e2vW%5Rk`6VHz(OSI>LOH4}I91{#@F3yicoieensF!Y4i{SAh`vns>p&Z>;L7~<eZhEdP$EJ^#t7`rNp;R!WNRH9E@VnjycZWH%Q2A=d^W)b;dD0oTI2jWm+RHI|1K1Fe^R)}GVg+bT%y7!$W5HlB)_K79ShW<+$OZ`sk4K9IzK{f7&;~A>|_rL#94dZU)4HG784CiO{2L}X1rAy3-CqZ|&V$m<_jRJCc%(5}^DCmwSFT?QO<5u7dI934{al#%Pf5cgb-L%=?KDuFdGywV4yM#KuX-ll36D2WV5q2Gf?<E$sKw{I*4Fm$O$1Fmt`#iWy`mEFGu$EnkcruCtL7_ejhn6kdSKC#1?0dZghO5wmk?*6%Xuf03cNhDru`cnD4!{Mr0zPK@PQsCpTZbm+-hf+f{Z2mFY?)bWn;VS=`--*J;h)Wh`Uk>U!?w|ZB#b`}A!6V_m*it-X_>k8B)m9(d6q=ru&Ilzm{59u`^bntHtpb}km|Gz&x+=>J#><OXSMBy1IG(Gb*LLdt`Uywe%N(zu=RczCxXgNRtTUU=b;lP7EXSRxub|0)R;3IawpoCu#!sXb8ywYkkIAas5We;!y0xa=|e;$!5u_V7+KXLFgbMhf^{$p-Ah$c$o923ooqX#_TWSe91zM7gqMml;xLH^qQa_z?jy29tds56yK#IDgF=}bezfO3a!8<)$O%-DjDVn{IR@A?#uOWUYGEbgPRt<-TnR@B#A)F+SNH?)5G#jS;6pP3NJrn)d#|if)r}av7X%Q@pBy`(6^?vCt}?5S>OVZ+XJ;UzYRv%H$vMC;Vb*RV4=T<hemm;+!5&V|pdtnopc;9-g6J}n<@sK~S5*8G`684<z6g1a${33?qS;Jg-1ibAw-UKcCM!u(ieBN0ieee9J<?T&%tOU|Iin=hMKZLCvKu9Rr14T_;vI%is*|WZf%~%W`L0FSrgy*?m%)&&0EfKs0P-g8p5f%`s=8F2yxL2B?XW7!pqj5%%8vC=DLo)4u$2u5Wkg9i=TU9UqnaHtP=d51KjLZLS1H$9UIk9uokdQ)A}*HCLuE1uAv0)Qu*`(~AmMWiOrfBaVN*cGpE@}C0s44VU#Dq(b$)UzF?6WX7&7Uo_q-@hXxzXiEP1oxcs6qYW}UI)B{+JJI0Q(j55$5c6J|hLB;Vgmj$CvONC2ZJO_R)qI#o3JDvBuA^=x{P>pC3%vYtiMM#<AU)sT9g0M?_(@i!ydYLyC^C8GL=dp@a&7;?qJ9(!~91F%;II+4d?3&@^E;V`yrTg`bIPqKP(Bl51U@5B(zjRg#5eYDWrg(v{svFXmLfT;!iD;9le*0m%U>MTJ68R3^Gp%YXUnWbD)xhPVN!Hh(!cyv4Pvdzpy@<xfN*o9~j|2X2&<cz#N#NV4Qb7XJqI{4@V3>3#+42sGjNK@VkzCCNlm;ym0e<xGI(jKzIg$_hos7xmolVi~oDtcJ1vzVJRo)`&&rUYvT_z$g|EPYy$2~u8xfw_E9TjA#I3>6|*)J}bf%e$e=uOXT~w_GQ2YM^XAl!Y{MEc*aOR~gTfwrXz9Z^r)3ECql+YhJOP9roNVq1IaeBx<?h78N%)%X(RB74~9%YB#y^H7akdgJtgS?uu<m%>@rqc|)$@M3H6#o<;8+=CNn2@hH}g1x-Qdi?o%6Vgwy#dB6`2V=ir&g3m!at#76ED64|bdl97k*8>Qx*XS^^lS8Syo)}zHH6Axw?AbGxogq=P{vub?(lwj8nzgh>FVd>sz`5hAV}3iVwsVC)4EY@e7j(AZl3-LHG0H&zdGPr7EbQKM^u8h%VDUJN?s;?^hQo7QQZ@3WXZ>*GyKhGURQ4P{=4!RMe{i^WaeRJ#`u5G~8TM1D4#9gvOScMHY_(RY{y2iHE|~zh(EzYFjN!3`j~+d4z?0)TL)?V|u!#X#5Z~M1J3T*ocX0jP#oqDJ`Q`Qg!SUWD^s?S4ML9Wo4G3%H2nX*^_Hc;xRw>FiduIpN?~h*Zzj+Usn9WFm3^9;t!D+4V0#C&_R6+ysBdgczSs6`n?K6>)5SNqwsYL$g*_+q(A)aDbRDK379HtWk^ATh)R<)lb!^mCH9aL?*AQE2}MPc1W2jK_kG3_3kUWv8i1N#D$4RU+lg9U<%x+scp)OI>NYJwXL<o{s-k#zf@XE=T4RtCivwUHt9G^K$RSM8!ULYVmm*q0bAO7r?1OxXV3`J1=1x|haFy$d0UWkcXJqoM_^)NF}JOY?IC$;yKam1^XcK+dnRC22Mo0nfJ_bcMmn_l~m<7(W}0t19_^5<GPQewzLJ-!kOxB8vTqRL$XvaSGe}>|+G7#hiFSuV{Ss!X!$@;r%+}@P7F?yq`4=!|fFergRu76KIwVvQP~cai#jvtTh;Tjb;H;8B2@}>y;V4_8z!#<bZ<${&JS6Y+7<D&}=;#U8IMT^9E|~vR%n|!MM~5)`aJbY17Z^O-yG;uEp@rqBpshJ!kPFmrK=51KL`kZJo5NPWuB?ZdF^Z+A@<H$_KMMXW0zBs*YAvPr1b<_LW&7TIR+fE)c6T%Tcz?X#d3646J)`iUDCf07)%GXaug-f%S*h6k4+a!F$e!dp_z^hb0ltmP#)`(gQE%nf!v5Aw?Cq13`=bkLn1iQDbUPs=<t`Wf(@uQ+P4xiy-z$2os~OKmwZe>}=(>k#M<NFgCC*30YReL5dGxBiA<T>`D{qJ29k9<KR@rB(lXce?pXjbI;!a+01-rW}1=&Sce^A;`x??^2EvcnHC{d-#RgWdw!lN6AP^3(leZ9qR|k=Ky<|SIjH-=c;IAOjD}#U{5y?cu*WP)hM|udp3tfU*yvfN3>eK6DtJweU{_2o6^2k*J*HwBvf8esW6!n+hS*AOyt{J~J(~_d6*bLSyM)QSC<8pRp60}9v;b}-^>$@O-uVJG=&wy$+j+EQW*OBhxoVqzRh;{hM?^j&p-tb(RHBpHVGu)6bt;k5sgm?9U+4-Q%WRyivLVe@?Q}}=e7)3>UFukM;w1h0z<IR9gBMs5qgJ>auxol8E23@B55e_XIYw5>_+YE7B_oL;H?qhXsgX>w{t<>en20skTiyeY=eQG49Q1l1mG}Hs)YV@ezd1YDPqP@aQP&S+Ix;iz?9?CUxw^i-9rb#2Xn}6(0+;Z6QRGalCayE(|G0T0dNNn~jmHKgJVn%MtRc_dlsmpAR}8((&WPOMp>4zWh*e{o8yjmIw%9bvP!VqYNiwepZI(`|q_gd_I&RsN9Lu(uO^WQ0$^=l}tS^}>Znu_c_dM0tV)P9hS&`Ep@(8yXouJF>;BinPOf89d;95l_>*8l716JXmQ<_K_a>a$z1az~Aj5Yxg7S6n%iVeWXj)aDMp**Ug5NH<$qEvz$rkHcJs?N|XAZg}mb*)vi^aLIrf4#~f%^db*&P!~gjZ9l1GtJZJ`W`e;Sks)$WQI~KG^I{zh?Lz+Iq5nzunrySDleeZpZcTBPep1aNv*P3`evg^wvp^(wWw#U1^w3M`aW${Mwz4m%ilX*@-3hAq>~hBma4>~Daf}5!!!pGM?SAI6tgnQ^#*?Jo#*mU7Fi!F;V8lTQTYS~+ot+z6(#g_H*&^DxOHY#s7<Y6#EBWrgKz-Bf)LfQ%6nB|mo?QAooV|@*Vq*!W6$XVF6|1sEK!ab?5rW>^{jw$Ht|laseo#`V(7Ldwz3H;jasz|xfpYDN*qv;QcdZQ!KkT=YdNEcTOS#gbhla6dFVFl>#c*v+Bz%=Lr6vjFyV(`bPT)&U04gC7BWSuP(!Ec$RCzZRHO1Z+ytyQV3KscgL^5qu~<%bR!?{wqhD|W*9XlU#CN}0W`LbS|8?9<hEajhLFfp3jIx1mL{N~q9-+)6463nQ)(#!)m-fDKO*?ZU)6lnz3_RSqZnRWCA|vKq4iYE}YAK$PcIzf91uG(@gXvPmSe|6t+fS_b@PZK8FkNuaWNbDa#5d;Vt?-pP2`V^gYT9iRQyWnM>Y8Et8PAQToasrLeAZJNSpAHtXJ}<9nJe(rz%x_|Ok2-QxfX1wdrSbCSIjo`GEQj*sYXMYN8aqdVlA+_opcq2;Vw-}EV^+NbMv-?Szlwt1XogeXf{ZKVfV9~HI>rd`r)lKj&I=6`atGVkA1JptxcO<)!0WmLf$SpA_APLREAN6HyAG79?N?UVy7Np3wy!iVv&I%WSD~NUW6%hJmg}-zz-dFCRif%h(Cn)26gDyZvTp*aQrDTu>UiI-*~a8*Iy*ujh~KlrB)#4h_Kp)%KI7BHmk5|>f@*je8Q|gp~Twrb|G$EKNh>6O}m}qOp0-yOPsmJ&}=MV4T$vTHHQL~L;Z#&x0r#2%%eyvO)8U0Dw;on7Oofj{tcy^VXqg{q4Z{cQm8ia?!17M_mkzHp)@I_w9qUFVb2*(HylppWd?G%%WPd49yXYlAm|pGPbq3zS*vKlEtk`@HQHnz8g3f_YC1CcEVn)u>I&+fFWw!viPHX1{S_jl=dE-f><-NSx(m76TtVv04AJ9jbQ|0i>(P{KOU!eYCat?mGL~P>+(e2FbNrTg$#^))-eXM-exjc!buZ0f45WEJ+d#t%|99fK7xC4GN@^jQ%BSR2>`RxIbK0?!(XMpw<u`Y{@)ig!T}g-GC(CS`EiZevUbqNZENmZT8G+##GUzJjFS*I496{cKQ~fT~X^~}&ZXH^gilzp=Oy72fc&18RSD6#4)|8yQ`1(HGA(&m~KvJ(33PK4on-|8Bhq-kT>ji$5*6wcAuFULySu(;H9N0y>7V<2S_7?Khc4o&!aBtD20NROmY5VMDe-zwXA1lK0%>jSSs_<N8+pG$vkvP>_B~kl!+u3cr<>guhC9<8HqAj~JweA11eLT6v{a@xrITjR+u^l`#PlYAr%q}Xu40on`oxOFIZaBRe@<8o2(Q78Z*?v>Ws0v<3K=1y<5jmUI)T;!u!YCuDH|)g=-C$+nYXQuXhwR+7t0w9EY)=bC{1S&<C}Y#+)h#)^kuz)aUu0}Pvz@7gTD1F#oluW;ET^ejZ-}i4VfRHsw2dp=)z=|&x?LW}ED6Osz*T*HyX$jD&6HI%eaKbGG|4?vCJZF)?}%>HchgG^a?r({=H}MCFF!Mf`(E5Nrcv(~XdOqXl&D65MWC(I%?)klvo|ut{&mR|e9boS?U!x+%8QVNK~-L6)vx(gCI2uLAdj1ZHw%YRn1tQX7cl~FJH^{objRa3CU-oBpXv7MYROxPY`QA@xJLcG9>+JfxNVY}vCP4=$y@&&M!r@GhHqYq1JR4OM|k2E2KWMq-dxxBIBiHbQ}X7C4>Ix$?WNNsW~%slL-suM)(f0yaxS(hs}z&OL1s0J7X|~dWsg_SO1AOyEkf|Q8Fa%5=W$8>GsvbpDY%$zG$#!z(Mr4ca@FU$nM7th|7sGwX*{!m&;E|~khvfYlz!gfNE&^z(kTo;zs*6%Cj|B)iTsJ9_lEF_bg_`M3Ew5i2U$ZD#ZeYtddsx_6Gp^e8p!B&dm40@4rVzc{v$^-ny24II8&T_T0Hw4VXD-lmc*%Ie^VByN=(uSH^re!yqR(I`t;)b`rzHc>+|cAHy39I@b9|=vA0%+vH#{hzPHmX$GA9Uv>{hkfA;e2n`3-Eb*%{J+k;Eh$9h>k^{^p7c|em%#zXI8#+jWd@h-pK>-EJ|mfRKo8XI^4{Np?t@1E!@YE-B1sX<B2JaiUU<Bdy)vAAp1%)IYIY~ag2DL>jZerSl7#)>BcoFNiirt#{nkS7|F{2&TFfp&44Qr}#hx|qMT>6Th}OBk;#3KGq$db*QCJDVl99kHp}_E*OX&368}<9dym7aZry*KDf>l(rYWEH9fes%XSo8|O(=sAO@cS_FlC(-81#BzQ5o9T?#5WnO%^Cm6VPMUeQQDBv3y8WlgQ_Y!*FODx1C+ey4YyeyKr3rS|6`K#gmdv#Sa%VYi$rP;7Guc6#%O!xKH+m+9%w}rA^E1qCu3vn^c&JfQH8~a#UYi(^luQB}DDiT`eTmq9`=~Il$nL=-Wh|j~*$+vt$uOL>Iz8i%JU)p9%)umcx>C_*^2rMH2v1;HTR72<lCYI_}2$4r#=ptB0@XUAOK0>Pq?R$4#(m=4G!6t%D4Ym+$X>bj}H4UyKxURts1UEFeiQuLNw-DUY;By3@Yw!hvFNjAz@bE(;0hY9}<N)v5BGf_Xn~3uIW8O=!>;siSQLM)HuYVb6Z}FfBORp5(k4lm^SOOB>L%@;1HwfHH;3WcG3G5@_O5gwiE`dV?dJ^~t0(TO4g+N~dM+kTl_$LBCNZ?xp?j>-HfG>d)1O^g#jX)rQHwc6hI7MJ6f$tFbQ37ufh$L`^KrDfC1QH2cATW}^I|Lpi@E(D&1inY$Q396;OeF9>2>gV=>(OB7xO*;Xo#T?k_Iy2Gj-TMSU}UMD9w?^o!RXn<FCx-hXn-a)9LGFD1gaAtq8PP@&O<ngyoARFP7ex2nSmHaV<&P=ELoD`yb1^0K<Fcw)<VVvnRVYlh-68Ma|TP1u89(h0s{jUM`k^OXxGj#J`Tl5yYTFXVwkWJc;FF9tt%fzX%dCL5_30+d?jaDrDctETG(Q`_IcME2qSalBU&b{jzu9orTE^1=ZYHfgwqKNsPR6msHhl!(RKrpFArP+B|H)^K43`<LnA_5JVDtZIiVhTp+oXOJ#s;Z<bHbOe-6p_^vL-flH=)-=Q$*=(<8TYNG_*GKIf49O^+PTAvv4g3(;3Ybk-1%>{|5Q6rDFk?@iHtQ}o{y3^WA?O~FD_@X!=YGzAw;!A4W?(G-j{1t(3xN>lLC61=noFD=1KOUgkCLh#ZOytD)_Ex}7m@IvzMk@R12pERqFzX(fhR%(0{#8Q(y@r1_g1kOn)CifnmvFzA^ytuzN91=@DK@LJ@T`N=9O6yJ>&rj<H2w|Y&uIGrCD2+-i6yMa+Dy39fsk6|)laZfzLw`aJQavlO=ji-j<2Pi`W5RC|Ngwe#3=I1TV7-)@kRVKR5R3+mw5TbInrTr>7PZo%HCeQl7Ol&o^|WY17Hy<Oo3dy#E!vVrTWQgAS@b+DdLfHm$Rgz}ph!83Q&?6io5VLAlwD%^#ZZ-whN5f~b5Vp3N|>j<GfAre$X1iAPb2=|g(C47!n2n5X#|;)D8&a=a@LJF4|I7fKsDpqQ)w>+_@VEs@x=tGA*MQ%D$W^x=ujyRef3aj57p=ns4DHn=bU5`(*u^MFr-6}P+RG-m8%xhaW=ZeaSOug8EVg+TZ*;LtsbEey%77}$o0Z^_(^9yQx62GxtdpJG(H&#Uo8*@BjK+N1ktIe7G0N>zd2K~8+(D0+zC&dg5o!4TAEO*Wr^5@6-PnhUy8Y((45QVv7R!}r8uUGJjP~rI&Fp3US^g5;i|3Qx~291d0c);9g$8zb@@s7z{?N^3W55NdnvQ~33@wW1c^ZKG+A7EROY-jR4ILH2rCPES(zEmPQiN*`0WL|Vl%aEjO$GNbo2N4?HuDCop=o@eK7{eTctPi6p_n9BE}msGgM|S<yFMiCVHmt*=|Sj_Usum%Xd`ya?x$UXU_~Gmx{<`mdK?da+xQhE~v@RbVc0pzgO1{#rBS6^0FdW!54Oom$<Z09RISk@uh5hnQc6w&rxcnt`A3X-}+D~-U_N!h(YmlS-Fz$9%j{VR$Gh{4~;Gy?OZbuC_mp2=9B(>rl9*-DHzsY=J4k>2eDC;HHcb8e7Utwm!NX?VQ6KM5=k2&#m5NzwA#zDMD)AQdk!S0bT{EaeCjhCqSiTgjylUJd}S!}-e~Uqp6pwre`)I<S6gvgGq0<Hy7-D^jdV5Dz>DEu`ZrJie&^GDak{`{i|u(>v!3u^^b$j)|0_(o+;^5Kw2=kiPAB-evM_xws(%HJ3iAJ%B6R|go_bd`PF0e~EfQwS%7_qBwQc4tPY5Hu#1QczcM^0^Gc8wgVlB-;vX{{f7QMhY4xkgl`O2n_rfQY6*@u+gl@5UB@bY}O)5D2WNnrMWH5XJqu}{pHIy22{%Yu?Zqcr4X^m`?}uO@D)(J!Gc_*Uc>%)Rr6RiCaKIi89%V-bF4)g%4tT<*3|;b+Rs`fbq!Kj<aC<?KUw_RDPr-&LlVh@U^N)>z>R{V4+DKIgt_JiD%0sDIpvQ6%!NaUlYup=zGBt*08xFfo8I0R-j-4f8_oEFrLJIfw%9{$x{Pf5tJWJ9wah;^Nfr;wwu6U%Wk#nu&bfM7=SR)?BN5Gy=>-`FVB57L>f2PBJjQ=`?dU#boGu&NqQFgwk&UJ-O4B{UlI^$|5gZOwEgIdQxkpp^V(YCp0lUNan&|{x7Xm^Yz=*VmQ}<h(DF^%X~;7ji2R4%DGtFla$j~%$XFn|3rUMNNZu2Qr5cEtIV3&RNt>Ix+rP47x>iXqema_RG*;C{Dp>vKHr)BlMd$BJM$mfl+iN%dl1GqDa~T@M)<t1UrKsUe*W@FhVwF*`2!hKo8iySs`yJ-_=gkZ-xXV>zwr70{8@%e=yL!7'.encode())
+INDEX_CONTENT_BR = base64.b85decode('8|QOTlnmCj7#RpQ4j>ZD{|KOEf_CY-RSbeFC1~&9_GiP;*wm#7PXlY}2Q0cY8X?K-{a)4o{Cr)f;29}vkTpA|(nehr%cmF*jyG&XM`dbm+H{(OcHXBN9zxcqFn0<t*Of+N>T6UA+kFP#JQv+&R0-S=;PY87KSq7%d4%qE$Qpz04z70L%q_Or^LY?_;vS&WIxx8gQ8;<&e{aiA18IyD*-7MhqYpAe=p@{}=e~EW?w(N*jTQ)1dmpq$Go!B^(E@Sga<q;d1x|8|1IgwTD0Sr2@Lw*KdY<Q7fFCqMGGRv4tCf`A0E+=i)v?qH0}u<Oxt-4oYe?EntPTl^!{*vlI&I8a+zH>7q59v7leTt#?iz*wAwaO>S2q=nCom@~^t#)pO9k<IUALfU7b<=MO|@O>08Rm*d*M9GJ(fsbQefmI_GHPzd&q286p7`e*HS)sALpN;rg@S8sZ*3t^px|nq59Zzs;IegBljg3!;@$=i(jnjwCrnBnSv|o=VbAa9q+w;(DSY;Bvqw9Q^Hz#H74cTJ+u5tL(1nLNm8?bvvc7F<X9xGA637e<_F@x^hKT`N!sBwh-FoNBJokBq%wbmn4@HI32A1QOJ1nTMDCQFU#(s!NpPL8vj;+Y%I`p^?K0fc4=$PNS<8})3b4}UE{la8M98B&EVa`enP$5>>5?ku`THE4Ek+%M+9TI5FSRqG!KI2b7DF8s+_w`VDnzpEeIG7~EJfkqy>wn^0nHp&4yp#2qQ6vYXQ=1z|F1o@*2h#zj5uH`Uyg?w=G+2vnn4-xy?(pB1DZsd{IpI#k<=r`5OoapU3tYfTy+L-_)upmF{y|KdVi3;b-Y3t2yvCfq%KpinFB-q+bCjsTDn0@p9|sn`<F@u`rQRV2n6qu3*4-!ZO$e5%Kt)2wozMb#0THl;mA3k>3gI%PTMA>!qm8>`-wu8vRt3Wi&@-fJhivNZZYaQ)?u<a7nH~-;rxvKC@L)PAPkH`(?7X9VJUL}I2xxKN-8l}$ikeQ_PzesfGLBE0;9KbEdF~~yxWloPhz+5Pa^H-XK@v1&or7!|FKWq|3|AtCa*>vE*A)00`O}8>lltZg;LKvUl*$|6fdgMmpO8bFwQYKe&$*VbDzSC3)Rr>@4c3XZAF;c!#HAX2H3bpfQ`<oMIir(v3EcIEF!?ywMg(_a`53u$U981w!6bv>(oV(e}Ovd2h6HS_w_|qU5p7)1q_~!iXE4Lio%|SkJ$k$T-e#wqoH}wsUv@$EEry;5Fzy+5g{~kwVHH@Y&?sV*}{(=qPdv%rI^ReGR<(kEzsip$Lss4U<*av#-0-LaLx=@?9LVjV8%Ruv<oOSZzEw*uZM`7lH=-gav4{P%tmIZ!71KUb$ymL{epKBm%0~TU|#fBTPk=@kp8p8D$vUWs7VFVifesoY)OkKi#qEv^PrJtIvx!ZA*R442A_en)gugWb>0oHP?|V4$Yx;<<QHZ)W;TN=+EApx68tXitN!53481x0%-WxZi*}50Y;N+;sT3y8=>-`q$1@gQw65~;mgb6*3^sCX<gXlm6LKc17y{{BRjSq_%wJ<doG`2C#5*G&5IDXFU>Xr2U4|J;=m=s6N#{aUPG_-;KeF%GUyU;1ly1++CrbK`W|t9$hk=C>rxSazY&JMd67m2aq+D;~U5mL|^V+95km4&B{pLzfpv5)Vm{Bs!^ECw<5fKYX2=kf#+;6W;LYiow0fZ@M$fwY~8e3AMHzrqncZ>&?76i9HlZ;%F9OoXy!sWP7c4h3`l7&pKC9y_UX{ny=vDj2MvPMKf6OA`XNdEhsNbZ7^8`wu)b$<vDQ6p%V-$V4yutH)Mc*=fh_Xe{_N6!7pu^SD-{hhHCuk`afKQM;BGfj!nM*p@<&1PbR^FwCyw#WS+Tg*U(U7~BRW0femBDTU@Dz8Od3fY6|>uP7li1*ciQKuGbaf@=I?IWskq7kAQWqw*9_)O&4wg-CmW3<+H%hCwLGT5N*0aK@{JX5@r`2*K6_|#Vqs+c!=m?B3`=AqjyMkayKmXiKRNSD2UW0Imoe2;(#ccglTHS^9-zSHfmJHwVnsEmz!ZiKMqW7pxs1#}Ug_-^G-JEe3UV7+eV^A9fYn*suQh21C+;@5s7$E4nA_NA*yUw$**9(;?+z0?0CO=b|cEy^YzncLg!xrZ?Jek-`z;5P(WLl)}$+-X1XdfgyFS6m(87l>P@<ir2EZ)B_Hy$1M7SpY@sOKNTci8LY}G`j9Q2l=YA)pv<C5uq<R*)NsH?=>f?$N0>sRjge7m8~Wmy228lnmBx{D8fBw>>NzJSTI?1*SgQtPB8-J;zY{L87zIdr|K{VsxO^`VC~bwb^&nNI(M4hOZ8Gt%Fkxai!J{1x(!x{Sd~E`y+71a=K^h+cbbXN+$%0#GE3}hx<dx6|GGT;P~UyIQfD2$QYU`uu_1w!Ee-G9VVwTi&986IoVh<AKjfv0)anlzr$Ua#A*FPQ8IecI=&r3v=j0kFeg?;f_joEP|I^N?A?iZfA2dj{63%-Q<lM{*k~qt`9SvUF+8KUS8gg$%L~1;Am=aSTfA0DKw1Q}_f94;rc!$Ki`k4qlLKrTuxf7{P3LAvlT+^G6xj%))8AxN?;c3;t5y?G&THl_5eTjMMV8LjmUKGotoYn6?(Vs~(k%C!(kz}xs$TX#sKBlQHE5=mKq+MTe4e@-o1K);awV~3y?53fgmR2K0K8(4xMdSY;fihNhI}mc{WVjXK?~u7uKxf$IUe~sB<Mt3tj$8f=&D-bMe9jD`zLbNqokEKsXjUqeQYd9Jnnmlq3WcKwZLu%}e<55)g~z;y;piTbJYZ<laIH3_(n;<j3UiOe2=kzg!kBP;q0ZP-E79*}x*Xvlda-e|ny3ZW*%=^r?=Li=c%juBanbGM&S$o9EH=|ZWe+!#OYd0qifB${Fbj|568l);q5KTCEa?oT4uQ5n@Gg}Js@zOF&4Eqb?a4?xr52$R0V<6M%Cn|BuBjAR3^%|+upujwl++d%NG)B}%9^_IwW>fWeFKk1H?)JmSM^df`Ib*(f!2@sSga^%Z&tXkiwQ*Lm|Hc|WkZ5(Fj-mYFgS`I3<cqlJQS2kD+y`55&C)P+h7z{bcn50T%(uy`ZF4#<Q<cT<EOe7*GyK%9j#9Qr&eERmxD2N9)6V`v@UIqG5JxEwc<2zhFDC$TsTl-g6(@<H%ZaF@)5As8|B)mO34=P%7i0IaNtSmc&2+w0B+uT%<PF92+>${JTit(!GeU22uiK4832nze;nsAK{~vz0&ieR>0Jf5k`uvw;CTG6#EP)1Yk}iN^sv55>g$~4$;^>ma`DS#N0R9onug^#D<!=jTf9EAJI+|9SK<25&YkO?J?R?DR1Ftdf(4##*$n?$5i!eb2`;Y?3B$l0LS_5_Ucxw1oIShG`L4Ts!ft7uz|3ls4CU+UpJ~BxGFBr_h}aIA*Jhj?x7j+S&Wo-?A61q0Y&=dJZyEBM?*F@*HZ92QKfCd*a09U`sQNb_C3jTwvxKi`7}26boIQ>oH!39+CJjlW@@Bg>){AfS;3SL)ozE~b$WDJ)P!Vxf78250tvj;z<NeMa&1PvC3)2z5ogR1DQX&dVDRL6fl3?rV*C-cE7NEkTI&rz$kst}GNC}b#>EM?P1eQZmD!J#x9HNl0VHGP9!=3&vu;Xx3mpx?H<VDp!)67`B{fbxkgmoqzu8(lOwbPH<*3zpSM0f+2lC^u1(z_P?cwA9l@4EYV(y~BPRX+`T<-qMBVMd_w`0UJy?kYn{xMa0a^IdUe$1@I;lM(EeUt>-J$t6+&yZ@38(Q2Q*Tc|NS#Y~*Rv_M2ByvqLiH!qAbDWc!d>`=zk%gSGI9z3d!zEM$HVYCpRXBz+%vudUDRdP7BlO&V7QVaI`q@3wtERirai$LN!OkhgEPhR(wUDMZ58GR$6QcT*EYbJ|kj0fdKLJ7h`IEu*jSL;JP8`&SxpG$jy>1Dg_bG%<m+0xNPGdF+mn*19b(YARRJT-tzQz@w%wf2y8yd0*jKSPkr5Xw_FM~2yyuDYh(?k~#oKk^|watC6t*g+Ol>xZUUp$<5L>O5li{2r7=nFa!IS=;H8HoL7lKqP8q+KPw+wJ5!wS2PQ#bu-=OBy3b0^7qs>401)g%CajaixPveb)M(bMnVY3XyiapFT<g`@Vfw4<4ZC^iP|Rc3|2J*QflAq2Y=OK4w}YbPlfiNNeu3Bc#-QKvTJxv2XFdMCMCQpgh<fLtc>g*=vVS+N%Ta6-jWBiHrbriC>Lu2J4yeCpv6O=W*-93Nw^^B2$&MAkg#1VAfMfx(J+8aeA5}W2r@X2emAS6pB%cka!^fF<h6+)*5CaMkou=LZ5_0<zR*f$(mXd8CL%UCI4fvUHA~<0T$IHVOflhyUvWv(|JBUTxRb+ePwC)xjuXIbNGabbkCVJpOle(SNKk*$$52VYhlO-wMC-iYtq4mfstF;#C%y(#Pfqnw&{#xu<H+wW<Ohg@25o<{Xl)@;QL;;fFEkD!Ng59!{nyMZG$n2!$N!x|pxSHfje{bOfeP)t1_JJlAB50axko;s2+wtr^vTQS4xE#pA`sA;)RZRssYJwT6)cF5w?zSWk}GZHOyd!~8`t5vw|FDt2xprLM($H<lOW&~pFc-O_C$LXYERK@WR7xcnGLG@CGw;ebZz`P{112eIyylP78ZZjQIkz9M=N%F;n{n$xH^-Mu?n*fd;hB-#NN&0YfF|yl$UsK&WcZWn@lLA-%=RMUygX>>so>cnoVEg(88BV;`%}j#K*>j5po5Ykwd7(^Zn`8Y>W)zq1e!Pny!`8SXm5p?o_o~n4$Uo+<;J8LR5Zo)k(NIe;w4clpvYcS%{cfP(rZ96k)Z8m0PGnCckDUW_R~c30Rw@GS(JDc*zCp6H&epD4`}Atu828=yPjXK@r+T7vm2*1ww!5=%or6zoejqy^^4X?6h4(it^4L3^J??I`F3dOO2w4Fw&ry`-s`dMJ_;(EfVfK)eJl6VM!`F#NESZjPmJ1Cz&+Ef1#_%(Y$B4EIpLKskmzLHI&^6h>&JrS!nMDGppH%0Smxqcp2p*@Npj>PH4uIB*`rd_wPx3x$Ncf39E*PO_qSdAS{{ajp|(&1XA$lG$J?iX544kI~x89FT99NxPvq3l=Q+PFKr6TO*K9Z%*5D^W?UC_c#gsJUw&r#Bc^2Hx8f(HbHPlSJkp_Jj;r+sgL<M>hL&OHc*D91LP;nQl*fmKybHOjU)$X9>flC28uc#p<KrNm2+l!LxhVOQDTIj>J{D>|@0r*InwwK98oorO@SDdfHYhtjjKTgdfLW$<LSz$1WvKx_SitVpKBb6&j0kFd#4_c}Ff%jP7Ai34SSNa&p|RTMzt&5nOZq;bP&-F<%(1OuQGQgH3{*56BjUJv1Oe{RC?(Z6+kyZU<xpl{G_X2kt&<Rx8|-`DLLvS%nJ{7FQrL0>D@d3E#W0k79Kp(t4NlynSoz&11%FqF#)Y6L=}!PFMA4C*(n`lS3*mQ-RI#^-naJ=?OE4h+4v?b3ua5o>+w^Adc~S*iY|u_U&37K@oeC1W_Rhddd#}{1e6Q4tvoE641(Z$XsghUw{>E|YspSWZ)961OR<Td&ul27QbG8(G;HbiwTs>3+kj_PBQb4y)hVtHO)|@5UjQ@3ny|Kbx_ll$K7a`BKYK7V-DxLvkGjDiUU)x*t>pnl2NR4(f(c{W@t*#j!GQ$P55^iR3NTz1`lcYphO6gg~gz-jcKQ!9km8V$OK$t!kRu#*>Y&5IIqiElSyNY2~J#F&%jvO>{%*Sz{pN=97XVPOH48op4ip<3*$uh%Wq9JWQoFUC4XV<n^8&3vW6rx=4Tsz|0JKv$)Wd|ykq4i`s&gHY{_IWqTpm;#o9uh%;c3exUxn|U!1@bhHGqSMJ3m`Zj9@<Ugdke{v<-U@j?)Py{ujZVA6k8qL`1Rg~xPINl9*KL)ifaOWCc-Av^dV1caf&!4Pc7}4MzVM+N>0{l0u1sw>#_}T^43^+N?+@lZB*m^bBf8GzkKqjFxCwr%wPfmu!4mhY@FcW1{W`Q_`xS2_%kQ$aYjw-n|zvR*M2B&*EDZ$v&)+Ja6hxP#C<Oh2c>B|PTNMuHHA$sU7!4_t0+KCA$3JG6w?%;r7LaS=;%&Y4|;mi*NcHDLor6;j3t;zGL>Q`&0Gl!r7V@P(wntDZ1iQTA3Offk1{4Pu8v~VF2`8guTno-Knisk_afhy^z-VYoy3T&g}ce-v0+V7y1NizbN^=x-y+kGlqBlPxTH4|#d$$<y)PGSKWz}z_G{@b)cm(SBO|-EA1hk4efW^D?PWO;?EU;og}j=Oh3z@YWFTC-7;z}$dU~~fk*cTu>A_<cs{bg}blcLw_u6aUUe-%t44K!{gwEuUOCry<o?69TF8PR;ep-vql+Tg!?+(9*<M<^!7I{*lZ+_x?t#2<|o_W7pW}rIebAdpXEZMT<$dM~oo;>;T6-;2>Xd6R>fJp>MSY&Jp4i%S%#|WSC1nwPeWgh?l0001h!!Pjx&&-`@$iG{xDSDA|Exa&sQ=TP2$Ig-CP<Zg-i`(Ig89c5!X{}`{0`}x5A%dwPK4{1ALDT%;-jTB1O=6f-vMOYqNV-yCnw<Su(qAN*pI6XnAnM~0`F=0*cqtW30A30nh6cQRSK!Nr<d2LQ!ZIUM5P_`7k{#J{B1dlI%8NYtk*`33#~A6o{Md-kC0s5_{syhs$;~g_bvBdNl`J6_Jn;yXx!sL)A+%%!-+mf;C@VN|jv3`4gC|~8*NRBFD*2DT&e)1El`bjKyRk|{{KL?ZAs)=p|F$v_Xi+Z<L%7o<tg-+f@&uwjDMB(tcl%fy(KWqfd7g!CSK#^_$MOQh>lrDAu2l3Z>M^swF5c1mR{0j;JzL%a_<>=Tl9GK!6sf^_sPS2H^W!=G);<q@eZ(P2Q3~o6qq^hpds_0+E>9_~@&79OyUQZe+uV{1!UAo2U51jrbxvOf;AhWUlmQH{%ejq0tUo~(NRXwtvsVOjTzN{OOu=8=fa%RZ%NnzDdk&3DP>?cdFgR(L?fcL&Ysyh{EP2hBzhE050DFJgIZn`c@jd}~>pTKFdBa{Z+;bb|RYE9wXPx^1aoJBQWdphQ*gXX7RTLbfP6O!O4L{#)qwl_v+8oYpAJemkpopi>*{6n!blSBYxfZwqjIVijbAo0pTf)|v1opA0IA}&>N&R)HS?SluDLX}%w$_7MG_uVM3RJd{cj`UdcbdgJ#ed&<*TR~}eN_Zu4h^9gMxvCNCRl_MC4QvB4G%nt&XqAs%f(ivneH}ZKQ|#89)I_vB5*0%jMA%K^sloR?}iHhcD;Ak-)iag!ImF9T&`~79a)k~d67*1xy?L2oXscT1f;a{K2fqs^}pj5b5xkh14M;|CSx_<lT6*c7A~Ve@oYd;D7)cZ@(~g?WYAd^_sCxA?gP|jb0Lui>DHQ~Yg;8C_-#ONtezSXY2EZ4X7!WSV*VYoI}*Prp@0GoXEc=QxlMe{*PBKuW&^N=fN2kFw(d0<Kr?%}6BhU8{5LDCdPX0#SN_r5PH7S$IYe6wrH3k`8vNMh--*-|?5@b@ZK<)9kuJ*Xn%_I+(i;K66m|fR&f7G$14?83y9A$&1v0;I*E{UqU0qT!HZMkg!eJZbrhs*)m>t3xextO*3Gv9m6|e{u!mp41NK4S8#@nFcs?&Y8)ym#Y0SX;lc4sjZ$8~ZK`yOwf(#OE(jtc~BiT6gOUHnNwYTW6fj~cVlW49!dGtsr}-fS$g7r6@?u2GHs_|C~Woi3qQ55noqgGa9({OrYpFna$WydFFZgyxTAP@AMS*7%9<O^4fD?oGUOXbjIglH7%w;y+<D$AW9l2@#A-NvUY7@Z1qF0ki3zwsbxocGn)AyTE5(jm$3!'.encode())
+INDEX_CONTENT = gzip.decompress(INDEX_CONTENT_GZIP)
+INDEX_ETAG = '"fbcbf3f445c706ff"'
+INDEX_ETAG_GZIP = '"fbcbf3f445c706ff-gz"'
+INDEX_ETAG_BR = '"fbcbf3f445c706ff-br"'
 
 
 # handler for /
 async def get__root(request: aiohttp.web.Request):
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } { request.path_qs }')
+    log_request(request)
 
     # Page
-    return aiohttp.web.Response(body=INDEX_CONTENT, content_type='text/html', status=200, charset='utf-8')
+    accept_encoding = request.headers.get('Accept-Encoding', '')
+
+    # Send precompressed page, brotli is smaller. Each encoding is separate representation with own ETag
+    if INDEX_CONTENT_BR is not None and 'br' in accept_encoding:
+        body, etag, content_encoding = INDEX_CONTENT_BR, INDEX_ETAG_BR, 'br'
+    elif 'gzip' in accept_encoding:
+        body, etag, content_encoding = INDEX_CONTENT_GZIP, INDEX_ETAG_GZIP, 'gzip'
+    else:
+        body, etag, content_encoding = INDEX_CONTENT, INDEX_ETAG, None
+
+    headers = { 'ETag': etag, 'Vary': 'Accept-Encoding' }
+
+    # Page not changed since last load
+    if request.headers.get('If-None-Match') == etag:
+        return aiohttp.web.Response(status=304, headers=headers)
+
+    if content_encoding is not None:
+        headers['Content-Encoding'] = content_encoding
+
+    return aiohttp.web.Response(body=body, content_type='text/html', status=200, charset='utf-8', headers=headers)
 
 
 if __name__ == '__main__':
@@ -368,6 +1647,11 @@ if __name__ == '__main__':
     parser.add_argument('--password', type=str, default=None, help='password for remote control session')
     parser.add_argument('--view_password', type=str, default=None, help='password for view only session (can only be set if --password is set)')
     parser.add_argument('--fullscreen', action='store_true', default=False, help='enable multi-display screen capture')
+    parser.add_argument('--codec', type=str, default='jpeg', choices=[ 'jpeg', 'webp', 'h264' ], help='frame codec, webp gives smaller frames at similar quality, h264 requires PyAV and WebCodecs in browser')
+    parser.add_argument('--chroma', type=str, default='420', choices=[ '420', '422', '444' ], help='JPEG chroma subsampling, 444 keeps sharp colored text at the cost of bigger frames')
+    parser.add_argument('--input_backend', type=str, default='pynput', choices=[ 'pynput', 'pyautogui' ], help='input backend, pynput has less overhead per event, pyautogui is used if pynput is not available')
+    parser.add_argument('--diff_threshold', type=int, default=0, metavar='{0..255}', choices=range(0, 256), help='max color channel difference of pixel treated as unchanged, suppresses partial frames on noisy sources like video')
+    parser.add_argument('--quiet', action='store_true', default=False, help='disable request log')
     args = parser.parse_args()
 
     # Password post-process
@@ -394,13 +1678,60 @@ if __name__ == '__main__':
     if args.password == args.view_password:
         args.view_password = None
 
+    # Encode once for access checks
+    if args.password is not None:
+        password_bytes = args.password.encode('utf-8')
+    if args.view_password is not None:
+        view_password_bytes = args.view_password.encode('utf-8')
+
+    jpeg_subsampling = JPEG_SUBSAMPLING[args.chroma]
+    quiet = args.quiet
+    diff_threshold = args.diff_threshold
+
+    if args.input_backend == 'pynput':
+        if pynput is None:
+            print('pynput is not available, falling back to pyautogui')
+            args.input_backend = 'pyautogui'
+        else:
+            pynput_mouse = pynput.mouse.Controller()
+            pynput_keyboard = pynput.keyboard.Controller()
+            pynput_buttons = (pynput.mouse.Button.left, pynput.mouse.Button.middle, pynput.mouse.Button.right)
+            pynput_keys = { name: getattr(pynput.keyboard.Key, key) for name, key in PYNPUT_KEY_NAMES.items() if hasattr(pynput.keyboard.Key, key) }
+
+    if args.codec == 'h264' and av is None:
+        print('PyAV is not installed, falling back to JPEG')
+        args.codec = 'jpeg'
+
+    # Pillow-SIMD is a drop-in replacement with faster resize & JPEG encode, warn if stock Pillow is used
+    if '.post' not in PIL.__version__:
+        print(f'Using Pillow { PIL.__version__ }, install pillow-simd for faster frame processing')
+
     # Set up server
     app = aiohttp.web.Application()
 
     # Routes
     app.router.add_get('/connect_input_ws', get__connect_input_ws)
     app.router.add_get('/connect_view_ws', get__connect_view_ws)
+    app.router.add_get('/stream', get__stream)
     app.router.add_get('/', get__root)
 
-    # Listen
-    aiohttp.web.run_app(app=app, port=args.port)
+    # Start numba thread pool from main thread before first frame. Changed band is wide enough to be split by columns so both kernels are launched
+    if diff_rows_kernel is not None:
+        try:
+            diff_regions(numpy.zeros((2, DIRTY_REGION_GAP + 2, 4), dtype=numpy.uint8), numpy.ones((2, DIRTY_REGION_GAP + 2, 4), dtype=numpy.uint8))
+
+        # Neither TBB nor OpenMP threading layer available
+        except ValueError:
+            print('No threadsafe numba threading layer, install tbb for JIT frame diff, falling back to numpy')
+            diff_rows_kernel = None
+            diff_columns_kernel = None
+
+    # libuv loop has less overhead per socket write & timer
+    loop = uvloop.new_event_loop() if uvloop is not None else None
+
+    # Listen, no per-request access log lines
+    log_listener.start()
+    try:
+        aiohttp.web.run_app(app=app, port=args.port, access_log=None, loop=loop)
+    finally:
+        log_listener.stop()
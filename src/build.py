@@ -2,6 +2,14 @@
 
 import base64
 import gzip
+import hashlib
+import os
+
+# Optional brotli, compresses page better than gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 
 def replace_template(src: str, template_name: str, new_text: str):
@@ -47,11 +55,57 @@ for l in page.split('\n'):
     lines.append(l)
 page = '\n'.join(lines)
 
-page = base64.b85encode(gzip.compress(page.encode('utf-8'))).decode()
-
-httprd = replace_template(httprd, 'INDEX_CONTENT', f'''INDEX_CONTENT = gzip.decompress(base64.b85decode('{ page }'.encode())).decode('utf-8')''')
-httprd = replace_template(httprd, 'get__root', f'''return aiohttp.web.Response(body=INDEX_CONTENT, content_type='text/html', status=200, charset='utf-8')''')
-
-
-with open('./../httprd.py', 'w', encoding='utf-8') as f:
-    f.write(httprd)
+# Page revision for browser cache validation
+etag = hashlib.sha1(page.encode('utf-8')).hexdigest()[:16]
+
+# Brotli page is embedded only if brotli is available at build time, client does not need it to decompress
+if brotli is not None:
+    page_br = base64.b85encode(brotli.compress(page.encode('utf-8'), mode=brotli.MODE_TEXT, quality=11)).decode()
+    page_br = f"base64.b85decode('{ page_br }'.encode())"
+else:
+    page_br = 'None'
+
+# Zero mtime keeps output identical for unchanged page
+page = base64.b85encode(gzip.compress(page.encode('utf-8'), mtime=0)).decode()
+
+# Page is kept as gzip & UTF-8 bytes and sent without per-request encoding
+httprd = replace_template(httprd, 'INDEX_CONTENT', f"""INDEX_CONTENT_GZIP = base64.b85decode('{ page }'.encode())
+INDEX_CONTENT_BR = { page_br }
+INDEX_CONTENT = gzip.decompress(INDEX_CONTENT_GZIP)
+INDEX_ETAG = '"{ etag }"'
+INDEX_ETAG_GZIP = '"{ etag }-gz"'
+INDEX_ETAG_BR = '"{ etag }-br"'""")
+httprd = replace_template(httprd, 'get__root', '''accept_encoding = request.headers.get('Accept-Encoding', '')
+
+    # Send precompressed page, brotli is smaller. Each encoding is separate representation with own ETag
+    if INDEX_CONTENT_BR is not None and 'br' in accept_encoding:
+        body, etag, content_encoding = INDEX_CONTENT_BR, INDEX_ETAG_BR, 'br'
+    elif 'gzip' in accept_encoding:
+        body, etag, content_encoding = INDEX_CONTENT_GZIP, INDEX_ETAG_GZIP, 'gzip'
+    else:
+        body, etag, content_encoding = INDEX_CONTENT, INDEX_ETAG, None
+
+    headers = { 'ETag': etag, 'Vary': 'Accept-Encoding' }
+
+    # Page not changed since last load
+    if request.headers.get('If-None-Match') == etag:
+        return aiohttp.web.Response(status=304, headers=headers)
+
+    if content_encoding is not None:
+        headers['Content-Encoding'] = content_encoding
+
+    return aiohttp.web.Response(body=body, content_type='text/html', status=200, charset='utf-8', headers=headers)''')
+
+
+# Skip rewrite if nothing changed
+try:
+    with open('./../httprd.py', 'r', encoding='utf-8') as f:
+        unchanged = f.read() == httprd
+except FileNotFoundError:
+    unchanged = False
+
+# Write through temporary file to never leave partially written script
+if not unchanged:
+    with open('./../httprd.py.tmp', 'w', encoding='utf-8') as f:
+        f.write(httprd)
+    os.replace('./../httprd.py.tmp', './../httprd.py')
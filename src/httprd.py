@@ -17,16 +17,29 @@
 VERSION = '4.1'
 
 import json
+import struct
 import aiohttp
 import aiohttp.web
 import argparse
+import asyncio
 import base64
+import concurrent.futures
+import contextlib
+import fractions
+import functools
 import gzip
+import hmac
+import logging
+import logging.handlers
+import mss
+import numpy
 import PIL
 import PIL.Image
-import PIL.ImageGrab
-import PIL.ImageChops
 import pyautogui
+import queue
+import sys
+import threading
+import time
 import traceback
 
 from datetime import datetime
@@ -36,12 +49,119 @@ try:
 except ImportError:
     from io import BytesIO
 
+# Optional libjpeg-turbo encoder, falls back to Pillow if library is not available
+try:
+    import turbojpeg
+    turbo_jpeg = turbojpeg.TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
+
+# Optional OpenCV resize, falls back to Pillow
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Optional H.264 encoding with PyAV (ffmpeg)
+try:
+    import av
+except ImportError:
+    av = None
+
+# Optional faster JSON parser for input events, both accept bytes
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Optional JIT-compiled frame diff, falls back to numpy
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Optional libuv event loop, not available on Windows
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# Optional fast hash for unchanged frame detection, falls back to shared grab identity check
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Optional direct input backend, falls back to pyautogui, fails to import without display on Linux
+try:
+    import pynput.keyboard
+    import pynput.mouse
+except ImportError:
+    pynput = None
+
+# Optional DXGI Desktop Duplication capture on Windows, falls back to mss
+try:
+    import dxcam
+except (ImportError, OSError, AttributeError):
+    dxcam = None
+
 # Const config
 DOWNSAMPLE = PIL.Image.BILINEAR
+# Integer box reduction applied before DOWNSAMPLE while image is larger than (reducing_gap * target size), trades quality for speed, None to disable
+DOWNSAMPLE_REDUCING_GAP = 2.0
+# Cheap box filter is used instead of DOWNSAMPLE for downscale factor at least DOWNSAMPLE_BOX_MIN_FACTOR and quality below DOWNSAMPLE_BOX_MAX_QUALITY, JPEG artifacts hide the difference
+DOWNSAMPLE_BOX = PIL.Image.BOX
+DOWNSAMPLE_BOX_MIN_FACTOR = 2.0
+DOWNSAMPLE_BOX_MAX_QUALITY = 60
 # Minimal amount of partial frames to be sent before sending full repaint frame to avoid fallback to full repaint on long delay channels
 MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT = 60
 # Minimal amount of empty frames to be sent before sending full repaint frame to avoid fallback to full repaint on long delay channels
 MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT = 120
+# Color bytes of little-endian BGRA pixel word
+PIXEL_COLOR_MASK = 0x00FFFFFF
+# Changed rows or columns separated by more than DIRTY_REGION_GAP unchanged ones are sent as separate regions
+DIRTY_REGION_GAP = 16
+# Max amount of regions in multi-region frame, more regions are merged pairwise with least extra area
+MAX_DIRTY_REGIONS = 8
+# Changed areas split into more regions are not merged and sent as single bounding box
+MAX_MERGED_REGIONS = 64
+# Multi-region frame is sent only if regions cover less than this part of their bounding box, each region costs extra image headers
+MAX_DIRTY_REGIONS_AREA = 0.5
+# Vertical scroll is searched in changed area of at least SCROLL_MIN_HEIGHT rows, client moves drawn pixels instead of receiving them again
+SCROLL_MIN_HEIGHT = 64
+# Min amount of rows matching at same offset to accept scroll
+SCROLL_MIN_ROWS = 16
+# Amount of sampled columns in row signature for scroll search
+SCROLL_SIGNATURE_COLUMNS = 64
+# Scroll frame is sent only if it leaves less than this part of changed area to encode
+SCROLL_MAX_AREA = 0.5
+# JPEG chroma subsampling by --chroma value, same numbers for Pillow subsampling and TJSAMP_*
+JPEG_SUBSAMPLING = { '420': 2, '422': 1, '444': 0 }
+# Frame send waits for drain once socket write buffer holds more than WRITE_BUFFER_HIGH bytes until it gets below WRITE_BUFFER_LOW, default limit of 64 KiB stalls on every large frame
+WRITE_BUFFER_HIGH = 1 << 20
+WRITE_BUFFER_LOW = 256 << 10
+# Empty frame is sent without grab & encode while socket write buffer holds more than MAX_WRITE_BUFFER_SIZE bytes. Finished send leaves
+# up to WRITE_BUFFER_HIGH bytes in buffer, so check against low mark catches link that has not drained previous frames
+MAX_WRITE_BUFFER_SIZE = WRITE_BUFFER_LOW
+# Amount of threads for screen grab, resize & encode, keeps event loop free during frame processing
+CAPTURE_THREADS = 2
+# Max screen grab rate, frame requests coming faster reuse last grab
+MAX_CAPTURE_FPS = 60
+# Websocket ping interval in seconds, keeps NAT mappings open and closes dead connections
+WS_HEARTBEAT = 30.0
+# Background capture stops after CAPTURE_IDLE_TIMEOUT seconds without frame requests
+CAPTURE_IDLE_TIMEOUT = 1.0
+# Smoothing factor of average interval between frame requests, background grab is timed to complete by next expected request
+CAPTURE_INTERVAL_EWMA = 0.2
+
+# H.264 encoders tried in order as (name, options, quality option), hardware first, no B-frames for low latency
+H264_ENCODERS = [
+    ('h264_nvenc', { 'preset': 'p1', 'tune': 'ull', 'zerolatency': '1', 'delay': '0', 'profile': 'baseline' }, 'cq'),
+    ('libx264', { 'preset': 'ultrafast', 'tune': 'zerolatency', 'profile': 'baseline' }, 'crf'),
+]
+# Keyframe interval in frames, client can not start decoding until keyframe
+H264_GOP_SIZE = 120
 
 # Input event types
 INPUT_EVENT_MOUSE_MOVE   = 0
@@ -51,36 +171,197 @@ INPUT_EVENT_MOUSE_SCROLL = 3
 INPUT_EVENT_KEY_DOWN     = 4
 INPUT_EVENT_KEY_UP       = 5
 
+# Mouse button index to pyautogui button name
+MOUSE_BUTTONS = ('left', 'middle', 'right')
+
+# pyautogui key name to pynput Key name, other named keys are sent with pyautogui
+PYNPUT_KEY_NAMES = {
+    'altleft':     'alt_l',
+    'altright':    'alt_r',
+    'backspace':   'backspace',
+    'capslock':    'caps_lock',
+    'ctrlleft':    'ctrl_l',
+    'ctrlright':   'ctrl_r',
+    'delete':      'delete',
+    'down':        'down',
+    'end':         'end',
+    'enter':       'enter',
+    'escape':      'esc',
+    'home':        'home',
+    'insert':      'insert',
+    'left':        'left',
+    'nexttrack':   'media_next',
+    'numlock':     'num_lock',
+    'pagedown':    'page_down',
+    'pageup':      'page_up',
+    'pause':       'pause',
+    'playpause':   'media_play_pause',
+    'prevtrack':   'media_previous',
+    'printscreen': 'print_screen',
+    'right':       'right',
+    'scrolllock':  'scroll_lock',
+    'shiftleft':   'shift_l',
+    'shiftright':  'shift_r',
+    'space':       'space',
+    'tab':         'tab',
+    'up':          'up',
+    'volumedown':  'media_volume_down',
+    'volumemute':  'media_volume_mute',
+    'volumeup':    'media_volume_up',
+    'winleft':     'cmd_l',
+    'winright':    'cmd_r',
+    **{ f'f{ i }': f'f{ i }' for i in range(1, 25) },
+}
+
 # Failsafe disable
 pyautogui.FAILSAFE = False
+# No sleep after each call, it would hold input thread shared by all sessions
+pyautogui.PAUSE = 0
+
+# Direct mouse input on Windows, one syscall per event without pyautogui wrappers
+if sys.platform == 'win32':
+    import ctypes
+    import ctypes.wintypes
+
+    class MOUSEINPUT(ctypes.Structure):
+        _fields_ = [
+            ('dx', ctypes.wintypes.LONG),
+            ('dy', ctypes.wintypes.LONG),
+            ('mouseData', ctypes.wintypes.DWORD),
+            ('dwFlags', ctypes.wintypes.DWORD),
+            ('time', ctypes.wintypes.DWORD),
+            ('dwExtraInfo', ctypes.c_size_t),
+        ]
+
+    # MOUSEINPUT is the largest member of INPUT union
+    class INPUT(ctypes.Structure):
+        _fields_ = [
+            ('type', ctypes.wintypes.DWORD),
+            ('mi', MOUSEINPUT),
+        ]
+
+    INPUT_MOUSE = 0
+    MOUSEEVENTF_WHEEL = 0x0800
+
+    # (down, up) flags for left, middle, right
+    MOUSEEVENTF_BUTTONS = ((0x0002, 0x0004), (0x0020, 0x0040), (0x0008, 0x0010))
+
+    user32 = ctypes.windll.user32
+
+    # Preallocated input struct, handlers run in single input thread only
+    mouse_input = INPUT(type=INPUT_MOUSE)
+    mouse_input_size = ctypes.sizeof(INPUT)
 
 # Args
 args = {}
 
+# Encoded passwords for constant-time compare
+password_bytes, view_password_bytes = None, None
+
+# JPEG chroma subsampling, 4:2:0 unless set by --chroma
+jpeg_subsampling = JPEG_SUBSAMPLING['420']
+
+# Max color channel difference of pixel treated as unchanged, set by --diff_threshold
+diff_threshold = 0
+
+# pynput controllers, None with pyautogui input backend
+pynput_mouse, pynput_keyboard = None, None
+
+# pynput buttons by button index & keys by pyautogui key name, filled on pynput backend start
+pynput_buttons = ()
+pynput_keys = {}
+
 # Real resolution
 real_width, real_height = 0, 0
 
 # Webapp
 app: aiohttp.web.Application
 
+# Request log, lines are written to console by listener thread instead of event loop
+log_queue = queue.SimpleQueue()
+logger = logging.getLogger('httprd')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+
+# Request log disabled by --quiet
+quiet = False
+
+# Log timestamp, formatted once per second
+log_timestamp = ''
+log_timestamp_second = 0
+
+# Threads for blocking frame processing
+capture_pool = concurrent.futures.ThreadPoolExecutor(max_workers=CAPTURE_THREADS, thread_name_prefix='capture')
+
+# Single thread for blocking input calls, keeps events of all sessions in order
+input_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='input')
+
+# Odd weights of row signature in scroll search
+scroll_signature_weights = numpy.random.default_rng(0).integers(1, 1 << 63, size=SCROLL_SIGNATURE_COLUMNS, dtype=numpy.uint64) | 1
+
+# Per-thread screen capture state, mss handles can not be shared between threads
+capture_local = threading.local()
+
+# Screen grab in progress, shared between concurrent frame requests, monotonic time of its start & duration of last grab
+grab_future: asyncio.Future = None
+grab_start_time = 0.0
+grab_duration = 0.0
+
+# Background capture loop and event of frame request
+capture_task: asyncio.Task = None
+capture_event: asyncio.Event = None
+
+# Monotonic time of last frame request and average interval between requests
+grab_request_time = 0.0
+grab_request_interval = 0.0
+
+# DXGI duplication camera & last returned frame, camera returns None if nothing changed since previous grab
+dxcam_camera = None
+dxcam_frame: numpy.ndarray = None
+
+# Last completed screen grab and monotonic time of completion
+grab_result: numpy.ndarray = None
+grab_result_time = 0.0
+
+
+# Precompiled little-endian codecs
+INT8 = struct.Struct('<B')
+INT16 = struct.Struct('<H')
+INT16_SIGNED = struct.Struct('<h')
+INT32 = struct.Struct('<I')
+# Frame request payload: viewport_width, viewport_height, quality
+FRAME_REQUEST = struct.Struct('<HHB')
+# Frame response header: packet_type, remote_width, remote_height, frame_type & frame type fields
+FRAME_HEADER = struct.Struct('<BHHB')
+FRAME_HEADER_PARTIAL = struct.Struct('<BHHBHH') # crop_x, crop_y
+FRAME_HEADER_H264 = struct.Struct('<BHHBB') # is_keyframe
+FRAME_HEADER_REGIONS = struct.Struct('<BHHBH') # region_count
+FRAME_HEADER_SCROLL = struct.Struct('<BHHBHHHHHHH') # src_x, src_y, width, height, dst_x, dst_y, region_count
+# Region header in multi-region frame: x, y, width, height, length
+REGION_HEADER = struct.Struct('<HHHHI')
 
 def decode_int8(data):
-    return int.from_bytes(data[0:1], 'little')
+    return data[0]
 
 def decode_int16(data):
-    return int.from_bytes(data[0:2], 'little')
+    return INT16.unpack_from(data)[0]
 
 def decode_int24(data):
-    return int.from_bytes(data[0:3], 'little')
+    return data[0] | data[1] << 8 | data[2] << 16
+
+def decode_int32(data):
+    return INT32.unpack_from(data)[0]
 
-def encode_int8(i):
-    return int.to_bytes(i, 1, 'little')
+encode_int8 = INT8.pack
 
-def encode_int16(i):
-    return int.to_bytes(i, 2, 'little')
+encode_int16 = INT16.pack
 
 def encode_int24(i):
-    return int.to_bytes(i, 3, 'little')
+    return INT32.pack(i & 0xFFFFFF)[:3]
+
+encode_int32 = INT32.pack
 
 def dump_bytes_dec(data):
     for i in range(len(data)):
@@ -88,21 +369,737 @@ def dump_bytes_dec(data):
     print()
 
 
+def decode_input_events(data) -> list:
+    """
+    Decode binary input packet payload into event lists in same format as JSON
+    input packet
+    """
+
+    events = []
+    offset = 0
+
+    while offset < len(data):
+        event_type = data[offset]
+        offset += 1
+
+        # Keys are length-prefixed ascii names
+        if event_type == INPUT_EVENT_KEY_DOWN or event_type == INPUT_EVENT_KEY_UP:
+            if offset >= len(data):
+                raise ValueError('Truncated input packet')
+
+            length = data[offset]
+            events.append([ event_type, bytes.decode(data[offset + 1:offset + 1 + length], encoding='ascii') ])
+            offset += 1 + length
+            continue
+
+        if event_type > INPUT_EVENT_KEY_UP:
+            raise ValueError(f'Unknown input event type { event_type }')
+
+        # Mouse events are x, y and button or scroll delta, truncated fields give same error as truncated key
+        if event_type == INPUT_EVENT_MOUSE_DOWN or event_type == INPUT_EVENT_MOUSE_UP:
+            size = 5
+        elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+            size = 6
+        else:
+            size = 4
+
+        if offset + size > len(data):
+            raise ValueError('Truncated input packet')
+
+        event = [ event_type, INT16.unpack_from(data, offset)[0], INT16.unpack_from(data, offset + 2)[0] ]
+        offset += 4
+
+        if event_type == INPUT_EVENT_MOUSE_DOWN or event_type == INPUT_EVENT_MOUSE_UP:
+            event.append(data[offset])
+            offset += 1
+        elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+            event.append(INT16_SIGNED.unpack_from(data, offset)[0])
+            offset += 2
+
+        events.append(event)
+
+    # Last event cut off
+    if offset > len(data):
+        raise ValueError('Truncated input packet')
+
+    return events
+
+
+def coalesce_input_events(data: list) -> list:
+    """
+    Keep only last of consecutive mouse moves and sum consecutive scrolls at
+    position of last, each applied event is an input syscall. Malformed events
+    are kept as is for handler to drop and never merged with neighbours
+    """
+
+    events = []
+    mergeable = False
+
+    for event in data:
+
+        # Validate move & scroll fields before merge
+        try:
+            event_type = event[0]
+            if event_type == INPUT_EVENT_MOUSE_MOVE:
+                event = [ event_type, int(event[1]), int(event[2]) ]
+            elif event_type == INPUT_EVENT_MOUSE_SCROLL:
+                event = [ event_type, int(event[1]), int(event[2]), int(event[3]) ]
+            else:
+                events.append(event)
+                mergeable = False
+                continue
+        except (IndexError, KeyError, TypeError, ValueError):
+            events.append(event)
+            mergeable = False
+            continue
+
+        if mergeable and events[-1][0] == event_type:
+            if event_type == INPUT_EVENT_MOUSE_SCROLL:
+                event[3] += events[-1][3]
+
+            events[-1] = event
+        else:
+            events.append(event)
+            mergeable = True
+
+    return events
+
+
+def log_request(request: aiohttp.web.Request, label: str = None):
+    """
+    Log request with timestamp cached for current second
+    """
+
+    global log_timestamp, log_timestamp_second
+
+    if quiet:
+        return
+
+    second = int(time.time())
+    if second != log_timestamp_second:
+        log_timestamp = datetime.fromtimestamp(second).strftime("%d.%m.%Y-%H:%M:%S")
+        log_timestamp_second = second
+
+    if label is None:
+        logger.info(f'[{ log_timestamp }] { request.remote } { request.method } { request.path_qs }')
+    else:
+        logger.info(f'[{ log_timestamp }] { request.remote } { request.method } [{ label }] { request.path_qs }')
+
+
+def check_access(request: aiohttp.web.Request, view: bool) -> bool:
+    """
+    Check request password against control password or view password if view access is allowed
+    """
+
+    password = request.query.get('password', '').strip().encode('utf-8')
+
+    if password_bytes is not None and hmac.compare_digest(password, password_bytes):
+        return True
+
+    return view and view_password_bytes is not None and hmac.compare_digest(password, view_password_bytes)
+
+
+def grab_screen() -> numpy.ndarray:
+    """
+    Capture primary monitor or all monitors in fullscreen mode as BGRA array
+    """
+
+    global dxcam_camera, dxcam_frame
+
+    # DXGI duplication covers single output only
+    if dxcam is not None and not args.fullscreen:
+        if dxcam_camera is None:
+            dxcam_camera = dxcam.create(output_color='BGRA')
+
+        frame = dxcam_camera.grab()
+
+        # No change on screen, same array lets callers skip diff
+        if frame is None:
+            if dxcam_frame is not None:
+                return dxcam_frame
+        else:
+            dxcam_frame = frame
+            return frame
+
+    # Reuse mss instance, it keeps device context between grabs
+    sct = getattr(capture_local, 'sct', None)
+    if sct is None:
+        sct = capture_local.sct = mss.mss()
+
+        # Resolve captured monitor once, monitor 0 is bounding box of all monitors
+        capture_local.monitor = sct.monitors[0 if args.fullscreen else 1]
+
+    shot = sct.grab(capture_local.monitor)
+
+    # Wrap raw BGRA buffer without copy, mss RGB conversion is done in python
+    return numpy.frombuffer(shot.raw, dtype=numpy.uint8).reshape(shot.height, shot.width, 4)
+
+
+def start_grab(now: float) -> asyncio.Future:
+    """
+    Start screen grab in capture thread, result is stored as latest grab
+    """
+
+    global grab_future, grab_start_time
+
+    grab_start_time = now
+    grab_future = asyncio.get_running_loop().run_in_executor(capture_pool, grab_screen)
+    grab_future.add_done_callback(grab_done)
+
+    return grab_future
+
+
+def grab_done(future: asyncio.Future):
+    """
+    Store completed grab, called before requests waiting for it resume
+    """
+
+    global grab_result, grab_result_time, grab_duration
+
+    if future.cancelled() or future.exception() is not None:
+        return
+
+    grab_result = future.result()
+    grab_result_time = time.monotonic()
+    grab_duration = grab_result_time - grab_start_time
+
+
+async def capture_loop():
+    """
+    Grab screen in background while frames are requested, next grab is timed
+    to complete by expected next request so requests do not wait for capture
+    """
+
+    while True:
+        future = grab_future
+        started = grab_start_time
+        await asyncio.wait((future, ))
+
+        # Wait until grab is used, grab started by request is used by it, stop until next request if nobody asks for frames
+        while grab_request_time < started:
+            capture_event.clear()
+            try:
+                await asyncio.wait_for(capture_event.wait(), CAPTURE_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                return
+
+        # Grab rate follows request rate up to MAX_CAPTURE_FPS, grab completes half of capture period before expected request to absorb jitter
+        next_start = max(started + 1.0 / MAX_CAPTURE_FPS, grab_request_time + grab_request_interval - grab_duration - 0.5 / MAX_CAPTURE_FPS)
+        await asyncio.sleep(max(0.0, next_start - time.monotonic()))
+
+        # Request could start grab by itself while waiting
+        if grab_future is future:
+            start_grab(time.monotonic())
+
+
+async def grab_screen_shared() -> numpy.ndarray:
+    """
+    Get latest screen grab shared for all connections. Returned image is
+    shared between connections and must not be modified in place
+    """
+
+    global capture_task, capture_event, grab_request_time, grab_request_interval
+
+    now = time.monotonic()
+
+    # Average interval between requests of all connections, first request after idle has no interval
+    if now - grab_request_time < CAPTURE_IDLE_TIMEOUT:
+        if grab_request_interval == 0.0:
+            grab_request_interval = now - grab_request_time
+        else:
+            grab_request_interval += (now - grab_request_time - grab_request_interval) * CAPTURE_INTERVAL_EWMA
+    grab_request_time = now
+
+    # Grab in progress is newer than last grab
+    if grab_future is not None and not grab_future.done():
+        future = grab_future
+
+    # Last grab is not older than new grab would take
+    elif grab_result is not None and now - grab_result_time < max(1.0 / MAX_CAPTURE_FPS, grab_duration):
+        future = None
+
+    else:
+        future = start_grab(now)
+
+    if capture_task is None or capture_task.done():
+        capture_event = asyncio.Event()
+        capture_task = asyncio.create_task(capture_loop())
+    capture_event.set()
+
+    if future is None:
+        return grab_result
+
+    # Cancelled request must not cancel grab for others
+    return await asyncio.shield(future)
+
+
+@functools.lru_cache(maxsize=16)
+def fit_size(width: int, height: int, max_width: int, max_height: int) -> tuple:
+    """
+    Get size fitting into max size with aspect ratio preserved, geometry
+    rarely changes between frames so results are cached
+    """
+
+    scale = min(max_width / width, max_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def fit_image(image: numpy.ndarray, max_width: int, max_height: int, quality: int) -> numpy.ndarray:
+    """
+    Downscale BGRA image to fit into max size, grabbed image is shared and can not be resized in place
+    """
+
+    height, width = image.shape[:2]
+
+    if width <= max_width and height <= max_height:
+        return image
+
+    size = fit_size(width, height, max_width, max_height)
+
+    # OpenCV resize kernels are vectorized, area averaging is used for strong downscale and has fast path for integer factors
+    if cv2 is not None:
+        if width / size[0] >= DOWNSAMPLE_BOX_MIN_FACTOR:
+            interpolation = cv2.INTER_AREA
+        else:
+            interpolation = cv2.INTER_LINEAR
+
+        return cv2.resize(image, size, interpolation=interpolation)
+
+    if width / size[0] >= DOWNSAMPLE_BOX_MIN_FACTOR and quality < DOWNSAMPLE_BOX_MAX_QUALITY:
+        resample = DOWNSAMPLE_BOX
+    else:
+        resample = DOWNSAMPLE
+
+    # Resize does not depend on channel order, wrap BGRA as RGBX without copy
+    wrapped = PIL.Image.frombuffer('RGBX', (width, height), numpy.ascontiguousarray(image), 'raw', 'RGBX', 0, 1)
+    return numpy.asarray(wrapped.resize(size, resample, reducing_gap=DOWNSAMPLE_REDUCING_GAP))
+
+
+def frame_hash(image: numpy.ndarray) -> int:
+    """
+    Hash full-resolution frame contents, None if xxhash is not available
+    """
+
+    if xxhash is None:
+        return None
+
+    return xxhash.xxh3_64_intdigest(numpy.ascontiguousarray(image))
+
+
+def pixel_words(image: numpy.ndarray) -> numpy.ndarray:
+    """
+    View BGRA image as (height, width) array of uint32 pixels, no copy for contiguous image
+    """
+
+    return numpy.ascontiguousarray(image).view(numpy.uint32).reshape(image.shape[:2])
+
+
+if numba is not None:
+
+    # Kernels are called from several capture threads, workqueue layer aborts process on concurrent launch
+    numba.config.THREADING_LAYER = 'threadsafe'
+
+    # Grabbed & resized frames can be read-only buffers, explicit read-only signatures compile kernels once on import for any frame
+    frame_pixels = numba.types.Array(numba.uint32, 2, 'C', readonly=True)
+
+    @numba.njit(inline='always')
+    def pixel_changed(last_pixel, pixel, threshold):
+        """
+        Check if any color channel of pixel differs by more than threshold
+        """
+
+        if threshold == 0:
+            return (last_pixel ^ pixel) & PIXEL_COLOR_MASK != 0
+
+        for shift in (0, 8, 16):
+            if abs(int((last_pixel >> shift) & 0xFF) - int((pixel >> shift) & 0xFF)) > threshold:
+                return True
+
+        return False
+
+    @numba.njit(numba.void(frame_pixels, frame_pixels, numba.int64[::1], numba.int64, numba.int64[::1], numba.int64[::1]), parallel=True, boundscheck=False)
+    def diff_rows_kernel(last_pixels, pixels, rows, threshold, row_left, row_right):
+        """
+        Find first & last changed column of each candidate row, -1 for row
+        with padding-only or below threshold change. Rows are scanned in
+        parallel, scan stops at first changed pixel from each side
+        """
+
+        width = pixels.shape[1]
+
+        for i in numba.prange(rows.size):
+            y = rows[i]
+
+            left = -1
+            for x in range(width):
+                if pixel_changed(last_pixels[y, x], pixels[y, x], threshold):
+                    left = x
+                    break
+
+            right = left
+            if left >= 0:
+                for x in range(width - 1, left, -1):
+                    if pixel_changed(last_pixels[y, x], pixels[y, x], threshold):
+                        right = x
+                        break
+
+            row_left[i] = left
+            row_right[i] = right
+
+    @numba.njit(numba.void(frame_pixels, frame_pixels, numba.int64[::1], numba.int64, numba.int64, numba.boolean[::1]), parallel=True, boundscheck=False)
+    def diff_columns_kernel(last_pixels, pixels, rows, threshold, left, columns):
+        """
+        Mark changed columns of band starting from left column. Chunks of
+        columns are scanned in parallel, scan stops when all columns of chunk
+        are marked
+        """
+
+        for chunk in numba.prange((columns.size + 63) // 64):
+            start = chunk * 64
+            end = min(start + 64, columns.size)
+            remaining = end - start
+
+            for y in rows:
+                for x in range(start, end):
+                    if not columns[x] and pixel_changed(last_pixels[y, left + x], pixels[y, left + x], threshold):
+                        columns[x] = True
+                        remaining -= 1
+
+                if remaining == 0:
+                    break
+
+else:
+    diff_rows_kernel = None
+    diff_columns_kernel = None
+
+
+def split_band(columns: numpy.ndarray, left: int, top: int, bottom: int, regions: list):
+    """
+    Append regions of band split on long unchanged column gaps
+    """
+
+    columns = numpy.flatnonzero(columns)
+    ends = numpy.append(numpy.flatnonzero(numpy.diff(columns) > DIRTY_REGION_GAP) + 1, columns.size)
+
+    start = 0
+    for end in ends:
+        regions.append((left + int(columns[start]), top, left + int(columns[end - 1]) + 1, bottom))
+        start = end
+
+
+def diff_regions(last_frame: numpy.ndarray, frame: numpy.ndarray) -> list:
+    """
+    Get bounding boxes (left, top, right, bottom) of changed areas, split into
+    horizontal bands and then by columns, empty list if frames are equal
+    """
+
+    last_pixels = pixel_words(last_frame)
+    pixels = pixel_words(frame)
+
+    # Whole pixel compare is one word op per pixel instead of strided per-channel compare
+    rows = numpy.flatnonzero((last_pixels != pixels).any(axis=1))
+    if rows.size == 0:
+        return []
+
+    if diff_rows_kernel is not None:
+
+        # Column bounds of candidate rows without boolean temporaries
+        row_left = numpy.empty(rows.size, dtype=numpy.int64)
+        row_right = numpy.empty(rows.size, dtype=numpy.int64)
+        diff_rows_kernel(last_pixels, pixels, rows, diff_threshold, row_left, row_right)
+
+        changed_rows = row_left >= 0
+        rows = rows[changed_rows]
+        row_left = row_left[changed_rows]
+        row_right = row_right[changed_rows]
+        if rows.size == 0:
+            return []
+
+        # Split changed rows into bands on long unchanged gaps
+        ends = numpy.append(numpy.flatnonzero(numpy.diff(rows) > DIRTY_REGION_GAP) + 1, rows.size)
+
+        regions = []
+        start = 0
+        for end in ends:
+            left = int(row_left[start:end].min())
+            right = int(row_right[start:end].max()) + 1
+
+            # Single changed column range can not be split
+            if right - left <= DIRTY_REGION_GAP + 1:
+                regions.append((left, int(rows[start]), right, int(rows[end - 1]) + 1))
+            else:
+                columns = numpy.zeros(right - left, dtype=numpy.bool_)
+                diff_columns_kernel(last_pixels, pixels, rows[start:end], diff_threshold, left, columns)
+                split_band(columns, left, int(rows[start]), int(rows[end - 1]) + 1, regions)
+
+            start = end
+
+        return regions
+
+    # Fourth byte is padding, recheck color bytes on candidate rows only
+    if diff_threshold == 0:
+        changed = ((last_pixels[rows] ^ pixels[rows]) & PIXEL_COLOR_MASK) != 0
+    else:
+
+        # Absolute difference without widening, channel flags are checked as one word per pixel
+        last_rows = last_frame[rows]
+        frame_rows = frame[rows]
+        difference = numpy.maximum(last_rows, frame_rows)
+        difference -= numpy.minimum(last_rows, frame_rows)
+        changed = (pixel_words(difference > diff_threshold) & PIXEL_COLOR_MASK) != 0
+    changed_rows = changed.any(axis=1)
+    rows = rows[changed_rows]
+    changed = changed[changed_rows]
+    if rows.size == 0:
+        return []
+
+    # Split changed rows into bands on long unchanged gaps
+    ends = numpy.append(numpy.flatnonzero(numpy.diff(rows) > DIRTY_REGION_GAP) + 1, rows.size)
+
+    regions = []
+    start = 0
+    for end in ends:
+
+        split_band(changed[start:end].any(axis=0), 0, int(rows[start]), int(rows[end - 1]) + 1, regions)
+        start = end
+
+    return regions
+
+
+def merge_regions(regions: list) -> list:
+    """
+    Merge regions pairwise with least extra area until MAX_DIRTY_REGIONS are
+    left, regions are (left, top, right, bottom) sorted by top
+    """
+
+    if len(regions) <= MAX_DIRTY_REGIONS:
+        return regions
+
+    if len(regions) > MAX_MERGED_REGIONS:
+        return [ (min(r[0] for r in regions), regions[0][1], max(r[2] for r in regions), regions[-1][3]) ]
+
+    boxes = numpy.array(regions, dtype=numpy.int64)
+    while len(boxes) > MAX_DIRTY_REGIONS:
+        area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+        # Area added by merging each pair into their bounding box
+        union = (numpy.maximum.outer(boxes[:, 2], boxes[:, 2]) - numpy.minimum.outer(boxes[:, 0], boxes[:, 0])) * \
+                (numpy.maximum.outer(boxes[:, 3], boxes[:, 3]) - numpy.minimum.outer(boxes[:, 1], boxes[:, 1]))
+        extra = union - area[:, None] - area[None, :]
+        numpy.fill_diagonal(extra, numpy.iinfo(numpy.int64).max)
+
+        i, j = numpy.unravel_index(numpy.argmin(extra), extra.shape)
+        boxes[i] = (min(boxes[i, 0], boxes[j, 0]), min(boxes[i, 1], boxes[j, 1]), max(boxes[i, 2], boxes[j, 2]), max(boxes[i, 3], boxes[j, 3]))
+        boxes = numpy.delete(boxes, j, axis=0)
+
+    boxes = boxes[numpy.lexsort((boxes[:, 0], boxes[:, 1]))]
+    return [ tuple(int(v) for v in box) for box in boxes ]
+
+
+def detect_scroll(last_frame: numpy.ndarray, frame: numpy.ndarray, bbox: tuple) -> int:
+    """
+    Get vertical offset of contents moved inside changed bounding box, 0 if
+    there is no scroll
+    """
+
+    left, top, right, bottom = bbox
+    if bottom - top < SCROLL_MIN_HEIGHT:
+        return 0
+
+    # Row signature is weighted sum of sampled pixels, wraps around on overflow
+    step = -(-(right - left) // SCROLL_SIGNATURE_COLUMNS)
+    last_sample = pixel_words(last_frame)[top:bottom, left:right:step] & PIXEL_COLOR_MASK
+    sample = pixel_words(frame)[top:bottom, left:right:step] & PIXEL_COLOR_MASK
+    weights = scroll_signature_weights[:sample.shape[1]]
+    last_signature = (last_sample.astype(numpy.uint64) * weights).sum(axis=1)
+    signature = (sample.astype(numpy.uint64) * weights).sum(axis=1)
+
+    # Only rows unique in both frames give unambiguous offset, blank rows match anywhere
+    last_values, last_rows, last_counts = numpy.unique(last_signature, return_index=True, return_counts=True)
+    values, rows, counts = numpy.unique(signature, return_index=True, return_counts=True)
+    last_unique = last_counts == 1
+    unique = counts == 1
+    _, last_index, index = numpy.intersect1d(last_values[last_unique], values[unique], assume_unique=True, return_indices=True)
+
+    # Most common non-zero offset wins
+    offsets = rows[unique][index] - last_rows[last_unique][last_index]
+    offsets = offsets[offsets != 0]
+    if offsets.size < SCROLL_MIN_ROWS:
+        return 0
+
+    offset_values, offset_counts = numpy.unique(offsets, return_counts=True)
+    best = offset_counts.argmax()
+    if offset_counts[best] < SCROLL_MIN_ROWS:
+        return 0
+
+    return int(offset_values[best])
+
+
+def encode_jpeg(image: numpy.ndarray, quality: int, fp: BytesIO):
+    """
+    Encode BGRA image into JPEG with libjpeg-turbo or Pillow as fallback,
+    output is appended to fp
+    """
+
+    if turbo_jpeg is not None:
+        fp.write(turbo_jpeg.encode(image, quality=quality, pixel_format=turbojpeg.TJPF_BGRX, jpeg_subsample=jpeg_subsampling, flags=turbojpeg.TJFLAG_FASTDCT))
+        return
+
+    height, width = image.shape[:2]
+
+    # Pillow writes directly into frame buffer, no intermediate copy
+    PIL.Image.frombuffer('RGB', (width, height), numpy.ascontiguousarray(image), 'raw', 'BGRX', 0, 1).save(fp=fp, format='JPEG', quality=quality, subsampling=jpeg_subsampling, optimize=False, progressive=False)
+
+
+def encode_webp(image: numpy.ndarray, quality: int, fp: BytesIO):
+    """
+    Encode BGRA image into lossy WebP with Pillow, method=0 is the fastest preset,
+    output is appended to fp
+    """
+
+    height, width = image.shape[:2]
+
+    PIL.Image.frombuffer('RGB', (width, height), numpy.ascontiguousarray(image), 'raw', 'BGRX', 0, 1).save(fp=fp, format='WEBP', quality=quality, method=0)
+
+
+def encode_frame(image: numpy.ndarray, quality: int, codec: str, fp: BytesIO):
+    """
+    Encode BGRA image with selected codec, output is appended to fp
+    """
+
+    if codec == 'webp':
+        encode_webp(image, quality, fp)
+    else:
+        encode_jpeg(image, quality, fp)
+
+
+def encode_regions(image: numpy.ndarray, regions: list, quality: int, codec: str, fp: BytesIO):
+    """
+    Encode regions of BGRA image with region headers, output is appended to fp
+    """
+
+    for region in regions:
+
+        # Reserve length, write body & patch length
+        header_offset = fp.tell()
+        fp.write(REGION_HEADER.pack(region[0], region[1], region[2] - region[0], region[3] - region[1], 0))
+        encode_frame(image[region[1]:region[3], region[0]:region[2]], quality, codec, fp)
+        end_offset = fp.tell()
+        fp.seek(header_offset + 8)
+        fp.write(encode_int32(end_offset - header_offset - REGION_HEADER.size))
+        fp.seek(end_offset)
+
+
+def create_h264_encoder(width: int, height: int, quality: int):
+    """
+    Open first available low-latency H.264 encoder for given frame size, None
+    if there is no working encoder
+    """
+
+    # Map quality [1, 100] to constant quality [51, 18], lower is better
+    constant_quality = str(round(51 - (quality - 1) * 33 / 99))
+
+    for name, options, quality_option in H264_ENCODERS:
+        try:
+            encoder = av.CodecContext.create(name, 'w')
+            encoder.width = width
+            encoder.height = height
+            encoder.pix_fmt = 'yuv420p'
+            encoder.time_base = fractions.Fraction(1, MAX_CAPTURE_FPS)
+            encoder.gop_size = H264_GOP_SIZE
+            encoder.max_b_frames = 0
+            encoder.options = { **options, quality_option: constant_quality }
+            encoder.open()
+            return encoder
+        except (av.error.FFmpegError, ValueError):
+            continue
+
+    return None
+
+
+def encode_h264(encoder, image: numpy.ndarray, pts: int) -> list:
+    """
+    Encode BGRA image into list of Annex B packets, packets expose buffer
+    protocol and can be written without copy
+    """
+
+    frame = av.VideoFrame.from_ndarray(numpy.ascontiguousarray(image), format='bgra')
+    frame.pts = pts
+
+    return encoder.encode(frame)
+
+
+def input_mouse_move(x: int, y: int):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+    else:
+        pyautogui.moveTo(x, y)
+
+
+def input_mouse_button(x: int, y: int, button: int, down: bool):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+        mouse_input.mi.mouseData = 0
+        mouse_input.mi.dwFlags = MOUSEEVENTF_BUTTONS[button][0 if down else 1]
+        user32.SendInput(1, ctypes.byref(mouse_input), mouse_input_size)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+        if down:
+            pynput_mouse.press(pynput_buttons[button])
+        else:
+            pynput_mouse.release(pynput_buttons[button])
+    elif down:
+        pyautogui.mouseDown(x, y, button=MOUSE_BUTTONS[button])
+    else:
+        pyautogui.mouseUp(x, y, button=MOUSE_BUTTONS[button])
+
+
+def input_mouse_scroll(x: int, y: int, dy: int):
+    if sys.platform == 'win32':
+        user32.SetCursorPos(x, y)
+        mouse_input.mi.mouseData = dy & 0xFFFFFFFF
+        mouse_input.mi.dwFlags = MOUSEEVENTF_WHEEL
+        user32.SendInput(1, ctypes.byref(mouse_input), mouse_input_size)
+    elif pynput_mouse is not None:
+        pynput_mouse.position = (x, y)
+        pynput_mouse.scroll(0, dy)
+    else:
+        pyautogui.scroll(dy, x, y)
+
+
+def input_key(key: str, down: bool):
+    if pynput_keyboard is not None:
+
+        # Single characters are typed by pynput as is
+        pynput_key = key if len(key) == 1 else pynput_keys.get(key)
+        if pynput_key is not None:
+            if down:
+                pynput_keyboard.press(pynput_key)
+            else:
+                pynput_keyboard.release(pynput_key)
+            return
+
+    if down:
+        pyautogui.keyDown(key)
+    else:
+        pyautogui.keyUp(key)
+
+
 async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.StreamResponse:
     """
     WebSocket endpoint for input & control data stream
     """
 
     # Check access
-    access = (args.password == request.query.get('password', '').strip())
+    access = check_access(request, view=False)
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } [{ "INPUT" if access else "NO ACCESS" }] { request.path_qs }')
+    log_request(request, 'INPUT' if access else 'NO ACCESS')
 
-    # Open socket
-    ws = aiohttp.web.WebSocketResponse()
+    # Open socket, input messages are too small for permessage-deflate
+    ws = aiohttp.web.WebSocketResponse(compress=False, heartbeat=WS_HEARTBEAT)
     await ws.prepare(request)
 
     # Close with error code on no access
@@ -116,11 +1113,90 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
     def release_keys():
         for k in state_keys.keys():
             if state_keys[k]:
-                pyautogui.keyUp(k)
+                input_key(k, False)
 
     def update_key_state(key, state):
         state_keys[key] = state
 
+    # Input event handlers
+
+    def mouse_position(event):
+        # Validate & clamp into screen bounds, inline compare instead of min/max calls
+        mouse_x = int(event[1])
+        mouse_y = int(event[2])
+        return (0 if mouse_x < 0 else real_width if mouse_x > real_width else mouse_x), (0 if mouse_y < 0 else real_height if mouse_y > real_height else mouse_y)
+
+    def mouse_move(event):
+        mouse_x, mouse_y = mouse_position(event)
+
+        input_mouse_move(mouse_x, mouse_y)
+
+    def mouse_down(event):
+        mouse_x, mouse_y = mouse_position(event)
+        button = event[3]
+
+        # Allow only left, middle, right
+        if not 0 <= button <= 2:
+            return
+
+        input_mouse_button(mouse_x, mouse_y, button, True)
+
+    def mouse_up(event):
+        mouse_x, mouse_y = mouse_position(event)
+        button = event[3]
+
+        # Allow only left, middle, right
+        if not 0 <= button <= 2:
+            return
+
+        input_mouse_button(mouse_x, mouse_y, button, False)
+
+    def mouse_scroll(event):
+        mouse_x, mouse_y = mouse_position(event)
+        dy = int(event[3])
+
+        input_mouse_scroll(mouse_x, mouse_y, dy)
+
+    def key_down(event):
+        keycode = event[1]
+
+        input_key(keycode, True)
+        update_key_state(keycode, True)
+
+    def key_up(event):
+        keycode = event[1]
+
+        input_key(keycode, False)
+        update_key_state(keycode, False)
+
+    # Event type to handler
+    input_handlers = {
+        INPUT_EVENT_MOUSE_MOVE:   mouse_move,
+        INPUT_EVENT_MOUSE_DOWN:   mouse_down,
+        INPUT_EVENT_MOUSE_UP:     mouse_up,
+        INPUT_EVENT_MOUSE_SCROLL: mouse_scroll,
+        INPUT_EVENT_KEY_DOWN:     key_down,
+        INPUT_EVENT_KEY_UP:       key_up,
+    }
+
+    def handle_input_events(data: list):
+        """
+        Apply batch of input events, called in input thread
+        """
+
+        # Iterate events, drop unknown
+        for event in coalesce_input_events(data):
+
+            # Drop malformed event without dropping the rest of batch
+            try:
+                handler = input_handlers.get(event[0])
+                if handler is None:
+                    continue
+
+                handler(event)
+            except (IndexError, KeyError, TypeError, ValueError):
+                traceback.print_exc()
+
     # Read stream
     async def async_worker():
 
@@ -138,58 +1214,20 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
                             continue
 
                         # Parse params
-                        packet_type = decode_int8(msg.data[0:1])
+                        packet_type = msg.data[0]
                         payload = msg.data[1:]
 
-                        # Input request
-                        if packet_type == 0x03:
+                        # Input request, JSON or binary
+                        if packet_type == 0x03 or packet_type == 0x04:
 
                             # Unpack events data
-                            data = json.loads(bytes.decode(payload, encoding='ascii'))
-
-                            # Iterate events
-                            for event in data:
-                                if event[0] == INPUT_EVENT_MOUSE_MOVE: # mouse position
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-
-                                    pyautogui.moveTo(mouse_x, mouse_y)
-                                elif event[0] == INPUT_EVENT_MOUSE_DOWN: # mouse down
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    button = event[3]
-
-                                    # Allow only left, middle, right
-                                    if button < 0 or button > 2:
-                                        continue
-
-                                    pyautogui.mouseDown(mouse_x, mouse_y, button=[ 'left', 'middle', 'right' ][button])
-                                elif event[0] == INPUT_EVENT_MOUSE_UP: # mouse up
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    button = event[3]
-
-                                    # Allow only left, middle, right
-                                    if button < 0 or button > 2:
-                                        continue
-
-                                    pyautogui.mouseUp(mouse_x, mouse_y, button=[ 'left', 'middle', 'right' ][button])
-                                elif event[0] == INPUT_EVENT_MOUSE_SCROLL: # mouse scroll
-                                    mouse_x = max(0, min(real_width, event[1]))
-                                    mouse_y = max(0, min(real_height, event[2]))
-                                    dy = int(event[3])
-
-                                    pyautogui.scroll(dy, mouse_x, mouse_y)
-                                elif event[0] == INPUT_EVENT_KEY_DOWN: # keypress
-                                    keycode = event[1]
-
-                                    pyautogui.keyDown(keycode)
-                                    update_key_state(keycode, True)
-                                elif event[0] == INPUT_EVENT_KEY_UP: # keypress
-                                    keycode = event[1]
-
-                                    pyautogui.keyUp(keycode)
-                                    update_key_state(keycode, False)
+                            if packet_type == 0x03:
+                                data = json_loads(payload)
+                            else:
+                                data = decode_input_events(payload)
+
+                            # Blocking input calls do not stall event loop, batch is awaited to keep order
+                            await asyncio.get_running_loop().run_in_executor(input_pool, handle_input_events, data)
                     except:
                         traceback.print_exc()
                 elif msg.type == aiohttp.WSMsgType.ERROR:
@@ -200,7 +1238,7 @@ async def get__connect_input_ws(request: aiohttp.web.Request) -> aiohttp.web.Str
     await async_worker()
 
     # Release stuck keys
-    release_keys()
+    await asyncio.get_running_loop().run_in_executor(input_pool, release_keys)
 
     return ws
 
@@ -211,15 +1249,13 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
     """
 
     # Check access
-    access = (args.password == request.query.get('password', '').strip()) or (args.view_password == request.query.get('password', '').strip())
+    access = check_access(request, view=True)
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } [{ "VIEW" if access else "NO ACCESS" }] { request.path_qs }')
+    log_request(request, 'VIEW' if access else 'NO ACCESS')
 
-    # Open socket
-    ws = aiohttp.web.WebSocketResponse()
+    # Open socket, frames are already compressed and permessage-deflate would only add a pass over every frame
+    ws = aiohttp.web.WebSocketResponse(compress=False, heartbeat=WS_HEARTBEAT)
     await ws.prepare(request)
 
     # Close with error code on no access
@@ -227,22 +1263,225 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
         await ws.close(code=4001, message=b'Unauthorized')
         return ws
 
-    # Frame buffer
-    buffer = BytesIO()
+    # Let full frame fit into write buffer without waiting for drain
+    if request.transport is not None:
+        request.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH, low=WRITE_BUFFER_LOW)
+
+    # Last screen frame
+    last_frame = None
+    # Track count of partial frames send since last full repaint frame send and prevent firing full frames on low internet
+    partial_frames_since_last_full_repaint_frame = 0
+    # Track count of empty frames send since last full repaint frame send and prevent firing full frames on low internet
+    empty_frames_since_last_full_repaint_frame = 0
+
+    # Store remote viewport size to force-push full repaint
+    viewport_width = 0
+    viewport_height = 0
+
+    # Source of last sent frame, unchanged source gives empty frame without resize & diff
+    last_source = None
+    last_source_hash = None
+
+    # Client sets h264=1 query param if it has WebCodecs decoder, otherwise JPEG is sent. H.264 frames have own frame type 0x03
+    codec = args.codec
+    if codec == 'h264' and request.query.get('h264') != '1':
+        codec = 'jpeg'
+
+    # H.264 encoder, recreated on frame size change, quality is set once per encoder to avoid keyframe on every adaptive quality step
+    h264_encoder = None
+    h264_pts = 0
+
+    def produce_frame(image: numpy.ndarray, req_viewport_width: int, req_viewport_height: int, quality: int) -> memoryview:
+        """
+        Resize, compare with last frame & encode, called in capture thread
+        """
+
+        nonlocal last_frame, partial_frames_since_last_full_repaint_frame, empty_frames_since_last_full_repaint_frame, viewport_width, viewport_height
+        nonlocal codec, h264_encoder, h264_pts, last_source, last_source_hash
+
+        # Frame response header is written in one piece with real dimensions and frame type
+        buffer = BytesIO()
+        real_frame_height, real_frame_width = image.shape[:2]
+
+        # Same shared grab or same screen contents as last time, skip resize, diff & encode
+        source_hash = None if image is last_source else frame_hash(image)
+        if last_source is not None and \
+                viewport_width == req_viewport_width and \
+                viewport_height == req_viewport_height and \
+                empty_frames_since_last_full_repaint_frame <= MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT and \
+                (image is last_source or (source_hash is not None and source_hash == last_source_hash and image.shape == last_source.shape)):
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+            empty_frames_since_last_full_repaint_frame += 1
 
-    # Read stream
-    async def async_worker():
+            return buffer.getbuffer()
+
+        if image is not last_source:
+            last_source = image
+            last_source_hash = source_hash
+
+        # Resize
+        image = fit_image(image, req_viewport_width, req_viewport_height, quality)
+
+        # H.264 does inter-frame diff by itself
+        if codec == 'h264':
+
+            # yuv420p requires even size
+            image = image[:image.shape[0] & ~1, :image.shape[1] & ~1]
+            height, width = image.shape[:2]
+
+            if h264_encoder is None or h264_encoder.width != width or h264_encoder.height != height:
+                h264_encoder = create_h264_encoder(width, height, quality)
+                h264_pts = 0
+
+            # Fall back to JPEG if no encoder available
+            if h264_encoder is None:
+                print('No H.264 encoder available, falling back to JPEG')
+                codec = 'jpeg'
+            else:
+                packets = encode_h264(h264_encoder, image, h264_pts)
+                h264_pts += 1
+
+                viewport_width = req_viewport_width
+                viewport_height = req_viewport_height
+                empty_frames_since_last_full_repaint_frame = 0
+
+                # Encoder has not produced output yet
+                if len(packets) == 0:
+                    buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+                    return buffer.getbuffer()
+
+                buffer.write(FRAME_HEADER_H264.pack(0x02, real_frame_width, real_frame_height, 0x03, 0x01 if any(packet.is_keyframe for packet in packets) else 0x00))
+                for packet in packets:
+                    buffer.write(packet)
+
+                return buffer.getbuffer()
+
+        # Check if this is first frame of should force repaint full surface
+        if last_frame is None or \
+                last_frame.shape != image.shape or \
+                viewport_width != req_viewport_width or \
+                viewport_height != req_viewport_height or \
+                partial_frames_since_last_full_repaint_frame > MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT or \
+                empty_frames_since_last_full_repaint_frame > MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT:
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x01))
+
+            # Write body
+            encode_frame(image, quality, codec, buffer)
+            last_frame = image
+
+            viewport_width = req_viewport_width
+            viewport_height = req_viewport_height
+            partial_frames_since_last_full_repaint_frame = 0
+            empty_frames_since_last_full_repaint_frame = 0
+
+            return buffer.getbuffer()
+
+        # Compare frames
+        regions = diff_regions(last_frame, image)
+
+        # Send nop
+        if len(regions) == 0:
+            buffer.write(FRAME_HEADER.pack(0x02, real_frame_width, real_frame_height, 0x00))
+            empty_frames_since_last_full_repaint_frame += 1
+
+            return buffer.getbuffer()
+
+        bbox = (min(r[0] for r in regions), regions[0][1], max(r[2] for r in regions), regions[-1][3])
+
+        # Scrolled contents are moved by client, only rows scrolled in are encoded
+        scroll = detect_scroll(last_frame, image, bbox)
+        if scroll != 0:
+            scroll_height = bbox[3] - bbox[1] - abs(scroll)
+            src_y = bbox[1] if scroll > 0 else bbox[1] - scroll
+            dst_y = src_y + scroll
+
+            # Diff against frame as it looks on client after copy
+            scrolled_frame = last_frame.copy()
+            scrolled_frame[dst_y:dst_y + scroll_height, bbox[0]:bbox[2]] = last_frame[src_y:src_y + scroll_height, bbox[0]:bbox[2]]
+            scroll_regions = diff_regions(scrolled_frame, image)
+
+            if sum((r[2] - r[0]) * (r[3] - r[1]) for r in scroll_regions) < SCROLL_MAX_AREA * sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions):
+
+                scroll_regions = merge_regions(scroll_regions)
+
+                buffer.write(FRAME_HEADER_SCROLL.pack(0x02, real_frame_width, real_frame_height, 0x05, bbox[0], src_y, bbox[2] - bbox[0], scroll_height, bbox[0], dst_y, len(scroll_regions)))
+                encode_regions(image, scroll_regions, quality, codec, buffer)
+
+                last_frame = image
+                partial_frames_since_last_full_repaint_frame += 1
+
+                return buffer.getbuffer()
+
+        # Send separate regions if they are small compared to their bounding box
+        regions = merge_regions(regions)
+        if len(regions) > 1 and \
+                sum((r[2] - r[0]) * (r[3] - r[1]) for r in regions) < MAX_DIRTY_REGIONS_AREA * (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]):
+            buffer.write(FRAME_HEADER_REGIONS.pack(0x02, real_frame_width, real_frame_height, 0x04, len(regions)))
+            encode_regions(image, regions, quality, codec, buffer)
+
+            last_frame = image
+            partial_frames_since_last_full_repaint_frame += 1
+
+        # Send partial repaint region
+        else:
+            buffer.write(FRAME_HEADER_PARTIAL.pack(0x02, real_frame_width, real_frame_height, 0x02, bbox[0], bbox[1]))
+
+            # Write body, crop is a view without copy
+            cropped = image[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+            encode_frame(cropped, quality, codec, buffer)
+            last_frame = image
+            partial_frames_since_last_full_repaint_frame += 1
+
+        # Expose written bytes without copy
+        return buffer.getbuffer()
+
+    # Latest frame request, requests arriving while frame is produced replace older ones
+    frame_request = None
+    frame_request_event = asyncio.Event()
+
+    # Frame produced in capture thread, can not be interrupted by worker cancel
+    frame_future: asyncio.Future = None
+
+    async def frame_worker():
+        """
+        Produce frame for latest request, runs while socket is open
+        """
+
+        global real_width, real_height
+        nonlocal frame_future
+
+        while True:
+            await frame_request_event.wait()
+            frame_request_event.clear()
+
+            try:
+                req_viewport_width, req_viewport_height, quality = frame_request
+
+                # Client can not keep up with sent data, skip frame and let diff catch up later
+                if request.transport is not None and request.transport.get_write_buffer_size() > MAX_WRITE_BUFFER_SIZE:
+                    await ws.send_bytes(FRAME_HEADER.pack(0x02, real_width, real_height, 0x00))
+                    continue
+
+                # Grab frame
+                image = await grab_screen_shared()
+
+                # Real dimensions
+                real_height, real_width = image.shape[:2]
 
-        # Last screen frame
-        last_frame = None
-        # Track count of partial frames send since last full repaint frame send and prevent firing full frames on low internet
-        partial_frames_since_last_full_repaint_frame = 0
-        # Track count of empty frames send since last full repaint frame send and prevent firing full frames on low internet
-        empty_frames_since_last_full_repaint_frame = 0
+                # Resize, diff & encode off the event loop, shielded so disconnect can wait for it
+                frame_future = asyncio.get_running_loop().run_in_executor(capture_pool, produce_frame, image, req_viewport_width, req_viewport_height, quality)
+                frame = await asyncio.shield(frame_future)
 
-        # Store remote viewport size to force-push full repaint
-        viewport_width = 0
-        viewport_height = 0
+                # Slow send delays frame on client, client adaptive quality reacts to it
+                await ws.send_bytes(frame)
+
+            # Cancellation on disconnect is not an error
+            except Exception:
+                traceback.print_exc()
+
+    # Read stream
+    async def async_worker():
+        nonlocal frame_request
 
         try:
 
@@ -258,79 +1497,12 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
                             continue
 
                         # Parse params
-                        packet_type = decode_int8(msg.data[0:1])
-                        payload = msg.data[1:]
+                        packet_type = msg.data[0]
 
-                        # Frame request
+                        # Frame request, picked up by frame worker
                         if packet_type == 0x01:
-                            req_viewport_width = decode_int16(payload[0:2])
-                            req_viewport_height = decode_int16(payload[2:4])
-                            quality = decode_int8(payload[4:5])
-
-                            # Grab frame
-                            if args.fullscreen:
-                                image = PIL.ImageGrab.grab(bbox=None, include_layered_windows=False, all_screens=True)
-                            else:
-                                image = PIL.ImageGrab.grab()
-
-                            # Real dimensions
-                            global real_width, real_height
-                            real_width, real_height = image.width, image.height
-
-                            # Resize
-                            if image.width > req_viewport_width or image.height > req_viewport_height:
-                                image.thumbnail((req_viewport_width, req_viewport_height), DOWNSAMPLE)
-
-                            # Write header: frame response
-                            buffer.seek(0)
-                            buffer.write(encode_int8(0x02))
-                            buffer.write(encode_int16(real_width))
-                            buffer.write(encode_int16(real_height))
-
-                            # Compare frames
-                            if last_frame is not None:
-                                diff_bbox = PIL.ImageChops.difference(last_frame, image).getbbox()
-
-                            # Check if this is first frame of should force repaint full surface
-                            if last_frame is None or \
-                                    viewport_width != req_viewport_width or \
-                                    viewport_height != req_viewport_height or \
-                                    partial_frames_since_last_full_repaint_frame > MIN_PARTIAL_FRAMES_BEFORE_FULL_REPAINT or \
-                                    empty_frames_since_last_full_repaint_frame > MIN_EMPTY_FRAMES_BEFORE_FULL_REPAINT:
-                                buffer.write(encode_int8(0x01))
-
-                                # Write body
-                                image.save(fp=buffer, format='JPEG', quality=quality)
-                                last_frame = image
-
-                                viewport_width = req_viewport_width
-                                viewport_height = req_viewport_height
-                                partial_frames_since_last_full_repaint_frame = 0
-                                empty_frames_since_last_full_repaint_frame = 0
-
-                            # Send nop
-                            elif diff_bbox is None :
-                                buffer.write(encode_int8(0x00))
-                                empty_frames_since_last_full_repaint_frame += 1
-
-                            # Send partial repaint region
-                            else:
-                                buffer.write(encode_int8(0x02))
-                                buffer.write(encode_int16(diff_bbox[0])) # crop_x
-                                buffer.write(encode_int16(diff_bbox[1])) # crop_y
-
-                                # Write body
-                                cropped = image.crop(diff_bbox)
-                                cropped.save(fp=buffer, format='JPEG', quality=quality)
-                                last_frame = image
-                                partial_frames_since_last_full_repaint_frame += 1
-
-                            buflen = buffer.tell()
-                            buffer.seek(0)
-                            mbytes = buffer.read(buflen)
-                            buffer.seek(0)
-
-                            await ws.send_bytes(mbytes)
+                            frame_request = FRAME_REQUEST.unpack_from(msg.data, 1)
+                            frame_request_event.set()
 
                     except:
                         traceback.print_exc()
@@ -339,11 +1511,96 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
         except:
             traceback.print_exc()
 
+    frame_task = asyncio.create_task(frame_worker())
+
     await async_worker()
 
+    # Cancel worker, it stops at its current await
+    frame_task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await frame_task
+
+    # Frame already running in capture thread still changes session state, wait for it to finish
+    if frame_future is not None:
+        with contextlib.suppress(Exception):
+            await frame_future
+
     return ws
 
 
+async def get__stream(request: aiohttp.web.Request) -> aiohttp.web.StreamResponse:
+    """
+    MJPEG stream endpoint for view-only clients, frame size and rate are set
+    by width, height, quality & fps query params
+    """
+
+    # Check access
+    access = check_access(request, view=True)
+
+    # Log request
+    log_request(request, 'STREAM' if access else 'NO ACCESS')
+
+    if not access:
+        raise aiohttp.web.HTTPUnauthorized()
+
+    # Stream params, zero size means no downscale
+    query = request.query
+    try:
+        max_width = int(query.get('width', 0)) or 65535
+        max_height = int(query.get('height', 0)) or 65535
+        quality = max(1, min(100, int(query.get('quality', 50))))
+        fps = max(1, min(60, int(query.get('fps', 20))))
+    except ValueError:
+        raise aiohttp.web.HTTPBadRequest()
+
+    # WebP only if client accepts it, H.264 can not be sent as multipart
+    codec = 'webp' if args.codec == 'webp' and 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    part_header = b'--frame\r\nContent-Type: image/' + codec.encode() + b'\r\nContent-Length: %d\r\n\r\n'
+
+    def produce_stream_frame(image: numpy.ndarray) -> memoryview:
+        """
+        Resize & encode, called in capture thread
+        """
+
+        buffer = BytesIO()
+        encode_frame(fit_image(image, max_width, max_height, quality), quality, codec, buffer)
+
+        return buffer.getbuffer()
+
+    response = aiohttp.web.StreamResponse(headers={
+        'Content-Type': 'multipart/x-mixed-replace; boundary=frame',
+        'Cache-Control': 'no-cache',
+    })
+    await response.prepare(request)
+
+    loop = asyncio.get_running_loop()
+
+    # Frames are paced by absolute deadlines, so send time does not accumulate as drift
+    frame_interval = 1.0 / fps
+    frame_deadline = loop.time()
+
+    try:
+        while True:
+
+            # Grab is shared with other viewers
+            image = await grab_screen_shared()
+            frame = await loop.run_in_executor(capture_pool, produce_stream_frame, image)
+
+            # Write multipart part
+            await response.write(part_header % len(frame))
+            await response.write(frame)
+            await response.write(b'\r\n')
+
+            # Skip missed deadlines instead of sending burst of frames to catch up
+            now = loop.time()
+            frame_deadline = max(frame_deadline + frame_interval, now)
+            await asyncio.sleep(frame_deadline - now)
+    except ConnectionResetError:
+        pass
+
+    return response
+
+
 # Encoded page hoes here
 # <template:INDEX_CONTENT>
 # </template:INDEX_CONTENT>
@@ -353,9 +1610,7 @@ async def get__connect_view_ws(request: aiohttp.web.Request) -> aiohttp.web.Stre
 async def get__root(request: aiohttp.web.Request):
 
     # Log request
-    now = datetime.now()
-    now = now.strftime("%d.%m.%Y-%H:%M:%S")
-    print(f'[{ now }] { request.remote } { request.method } { request.path_qs }')
+    log_request(request)
 
     # Page
     # <template:get__root>
@@ -371,6 +1626,11 @@ if __name__ == '__main__':
     parser.add_argument('--password', type=str, default=None, help='password for remote control session')
     parser.add_argument('--view_password', type=str, default=None, help='password for view only session (can only be set if --password is set)')
     parser.add_argument('--fullscreen', action='store_true', default=False, help='enable multi-display screen capture')
+    parser.add_argument('--codec', type=str, default='jpeg', choices=[ 'jpeg', 'webp', 'h264' ], help='frame codec, webp gives smaller frames at similar quality, h264 requires PyAV and WebCodecs in browser')
+    parser.add_argument('--chroma', type=str, default='420', choices=[ '420', '422', '444' ], help='JPEG chroma subsampling, 444 keeps sharp colored text at the cost of bigger frames')
+    parser.add_argument('--input_backend', type=str, default='pynput', choices=[ 'pynput', 'pyautogui' ], help='input backend, pynput has less overhead per event, pyautogui is used if pynput is not available')
+    parser.add_argument('--diff_threshold', type=int, default=0, metavar='{0..255}', choices=range(0, 256), help='max color channel difference of pixel treated as unchanged, suppresses partial frames on noisy sources like video')
+    parser.add_argument('--quiet', action='store_true', default=False, help='disable request log')
     args = parser.parse_args()
 
     # Password post-process
@@ -397,13 +1657,60 @@ if __name__ == '__main__':
     if args.password == args.view_password:
         args.view_password = None
 
+    # Encode once for access checks
+    if args.password is not None:
+        password_bytes = args.password.encode('utf-8')
+    if args.view_password is not None:
+        view_password_bytes = args.view_password.encode('utf-8')
+
+    jpeg_subsampling = JPEG_SUBSAMPLING[args.chroma]
+    quiet = args.quiet
+    diff_threshold = args.diff_threshold
+
+    if args.input_backend == 'pynput':
+        if pynput is None:
+            print('pynput is not available, falling back to pyautogui')
+            args.input_backend = 'pyautogui'
+        else:
+            pynput_mouse = pynput.mouse.Controller()
+            pynput_keyboard = pynput.keyboard.Controller()
+            pynput_buttons = (pynput.mouse.Button.left, pynput.mouse.Button.middle, pynput.mouse.Button.right)
+            pynput_keys = { name: getattr(pynput.keyboard.Key, key) for name, key in PYNPUT_KEY_NAMES.items() if hasattr(pynput.keyboard.Key, key) }
+
+    if args.codec == 'h264' and av is None:
+        print('PyAV is not installed, falling back to JPEG')
+        args.codec = 'jpeg'
+
+    # Pillow-SIMD is a drop-in replacement with faster resize & JPEG encode, warn if stock Pillow is used
+    if '.post' not in PIL.__version__:
+        print(f'Using Pillow { PIL.__version__ }, install pillow-simd for faster frame processing')
+
     # Set up server
     app = aiohttp.web.Application()
 
     # Routes
     app.router.add_get('/connect_input_ws', get__connect_input_ws)
     app.router.add_get('/connect_view_ws', get__connect_view_ws)
+    app.router.add_get('/stream', get__stream)
     app.router.add_get('/', get__root)
 
-    # Listen
-    aiohttp.web.run_app(app=app, port=args.port)
+    # Start numba thread pool from main thread before first frame. Changed band is wide enough to be split by columns so both kernels are launched
+    if diff_rows_kernel is not None:
+        try:
+            diff_regions(numpy.zeros((2, DIRTY_REGION_GAP + 2, 4), dtype=numpy.uint8), numpy.ones((2, DIRTY_REGION_GAP + 2, 4), dtype=numpy.uint8))
+
+        # Neither TBB nor OpenMP threading layer available
+        except ValueError:
+            print('No threadsafe numba threading layer, install tbb for JIT frame diff, falling back to numpy')
+            diff_rows_kernel = None
+            diff_columns_kernel = None
+
+    # libuv loop has less overhead per socket write & timer
+    loop = uvloop.new_event_loop() if uvloop is not None else None
+
+    # Listen, no per-request access log lines
+    log_listener.start()
+    try:
+        aiohttp.web.run_app(app=app, port=args.port, access_log=None, loop=loop)
+    finally:
+        log_listener.stop()
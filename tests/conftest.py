@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+# Server is a single script in src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# pyautogui needs a display on import (KeyError: 'DISPLAY' on headless Linux), code under test does not use it
+try:
+    import pyautogui
+except Exception:
+    sys.modules['pyautogui'] = types.ModuleType('pyautogui')
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import io
+import struct
+
+import aiohttp
+import aiohttp.test_utils
+import aiohttp.web
+import numpy
+import PIL.Image
+import pytest
+
+import httprd
+
+
+def changed_runs(indices: numpy.ndarray) -> list:
+    if indices.size == 0:
+        return []
+
+    splits = numpy.flatnonzero(numpy.diff(indices) > httprd.DIRTY_REGION_GAP) + 1
+    return [ (int(run[0]), int(run[-1]) + 1) for run in numpy.split(indices, splits) ]
+
+
+def brute_force_regions(last_frame: numpy.ndarray, frame: numpy.ndarray, threshold: int) -> list:
+    changed = numpy.abs(last_frame[:, :, :3].astype(int) - frame[:, :, :3]).max(axis=2) > threshold
+
+    regions = []
+    for top, bottom in changed_runs(numpy.flatnonzero(changed.any(axis=1))):
+        for left, right in changed_runs(numpy.flatnonzero(changed[top:bottom].any(axis=0))):
+            regions.append((left, top, right, bottom))
+
+    return regions
+
+
+@pytest.fixture(params=[ 'numpy', 'numba' ])
+def diff_path(request, monkeypatch):
+    if request.param == 'numba' and httprd.diff_rows_kernel is None:
+        pytest.skip('numba is not available')
+
+    if request.param == 'numpy':
+        monkeypatch.setattr(httprd, 'diff_rows_kernel', None)
+
+    return request.param
+
+
+@pytest.mark.parametrize('threshold', [ 0, 4 ])
+def test_diff_regions_match_brute_force(diff_path, threshold, monkeypatch):
+    monkeypatch.setattr(httprd, 'diff_threshold', threshold)
+    rng = numpy.random.default_rng(11)
+
+    for _ in range(200):
+        height, width = rng.integers(1, 120, 2)
+        last_frame = rng.integers(0, 255, (height, width, 4), dtype=numpy.uint8)
+        frame = last_frame.copy()
+
+        # Single channel changes, padding byte changes must be ignored
+        for _ in range(rng.integers(0, 8)):
+            frame[rng.integers(0, height), rng.integers(0, width), rng.integers(0, 4)] = rng.integers(0, 255)
+
+        assert httprd.diff_regions(last_frame, frame) == brute_force_regions(last_frame, frame, threshold)
+
+
+def test_diff_regions_read_only_frames(diff_path):
+    last_frame = numpy.zeros((64, 64, 4), dtype=numpy.uint8)
+    frame = last_frame.copy()
+    frame[10:20, 5:8] = 1
+    frame[40, 50] = 1
+
+    last_frame.flags.writeable = False
+    frame.flags.writeable = False
+
+    assert httprd.diff_regions(last_frame, frame) == [ (5, 10, 8, 20), (50, 40, 51, 41) ]
+
+
+def test_merge_regions_covers_all():
+    rng = numpy.random.default_rng(3)
+    regions = sorted(((int(x), int(y), int(x) + 5, int(y) + 5) for x, y in rng.integers(0, 1000, (40, 2))), key=lambda region: region[1])
+
+    merged = httprd.merge_regions(regions)
+
+    assert len(merged) == httprd.MAX_DIRTY_REGIONS
+    for region in regions:
+        assert any(m[0] <= region[0] and m[1] <= region[1] and m[2] >= region[2] and m[3] >= region[3] for m in merged)
+
+
+def scrolling_content(rng, height: int, width: int) -> numpy.ndarray:
+    """
+    Text-like rows: random gray blocks 8 pixels wide, every row differs
+    """
+
+    blocks = numpy.repeat(rng.integers(0, 255, (height, width // 8 + 1, 1), dtype=numpy.uint8), 8, axis=1)[:, :width]
+    content = numpy.empty((height, width, 4), dtype=numpy.uint8)
+    content[:, :, :3] = blocks
+    content[:, :, 3] = 255
+    return content
+
+
+@pytest.mark.parametrize('offset', [ 37, -20 ])
+def test_detect_scroll(offset):
+    rng = numpy.random.default_rng(5)
+    height, width, top = 480, 640, 60
+
+    last_frame = scrolling_content(rng, height, width)
+    frame = last_frame.copy()
+
+    # Content below top moves up for positive offset
+    if offset > 0:
+        frame[top:height - offset] = last_frame[top + offset:]
+        frame[height - offset:] = scrolling_content(rng, offset, width)
+    else:
+        frame[top - offset:] = last_frame[top:height + offset]
+        frame[top:top - offset] = scrolling_content(rng, -offset, width)
+
+    bbox = (0, top, width, height)
+    assert httprd.detect_scroll(last_frame, frame, bbox) == -offset
+
+
+def test_scroll_frame(monkeypatch):
+    rng = numpy.random.default_rng(5)
+    height, width, top, offset = 480, 640, 60, 37
+
+    screen = scrolling_content(rng, height, width)
+    scrolled = screen.copy()
+    scrolled[top:height - offset] = screen[top + offset:]
+    scrolled[height - offset:] = scrolling_content(rng, offset, width)
+
+    frames = [ screen, scrolled ]
+
+    monkeypatch.setattr(httprd, 'args', argparse.Namespace(fullscreen=False, codec='jpeg'))
+    monkeypatch.setattr(httprd, 'password_bytes', b'')
+    monkeypatch.setattr(httprd, 'quiet', True)
+    monkeypatch.setattr(httprd, 'grab_screen', lambda: frames[0])
+
+    # Capture state is global, start from scratch in this event loop
+    monkeypatch.setattr(httprd, 'capture_task', None)
+    monkeypatch.setattr(httprd, 'grab_future', None)
+    monkeypatch.setattr(httprd, 'grab_result', None)
+
+    def decode(data) -> numpy.ndarray:
+        return numpy.asarray(PIL.Image.open(io.BytesIO(data)).convert('RGB')).astype(int)
+
+    async def run() -> list:
+        app = aiohttp.web.Application()
+        app.router.add_get('/connect_view_ws', httprd.get__connect_view_ws)
+
+        async with aiohttp.test_utils.TestClient(aiohttp.test_utils.TestServer(app)) as client:
+            async with client.ws_connect('/connect_view_ws?password=') as ws:
+                responses = []
+
+                for _ in range(2):
+                    await ws.send_bytes(bytes([ 0x01 ]) + httprd.FRAME_REQUEST.pack(width, height, 95))
+                    responses.append((await ws.receive()).data)
+
+                    # Next grab must not be served from last one
+                    frames.pop(0)
+                    await asyncio.sleep(0.1)
+
+                return responses
+
+    full, scroll = asyncio.run(run())
+
+    assert full[5] == 0x01
+    assert scroll[5] == 0x05
+
+    src_x, src_y, copy_width, copy_height, dst_x, dst_y, region_count = struct.unpack_from('<HHHHHHH', scroll, 6)
+    assert (src_x, src_y, copy_width, copy_height, dst_x, dst_y) == (0, top + offset, width, height - top - offset, 0, top)
+
+    # Apply frames as client does, result matches screen within JPEG error
+    canvas = decode(full[6:])
+    canvas[dst_y:dst_y + copy_height, dst_x:dst_x + copy_width] = canvas[src_y:src_y + copy_height, src_x:src_x + copy_width].copy()
+
+    offset = 20
+    encoded_area = 0
+    for _ in range(region_count):
+        x, y, region_width, region_height, length = httprd.REGION_HEADER.unpack_from(scroll, offset)
+        offset += httprd.REGION_HEADER.size
+        canvas[y:y + region_height, x:x + region_width] = decode(scroll[offset:offset + length])
+        offset += length
+        encoded_area += region_width * region_height
+
+    assert encoded_area < httprd.SCROLL_MAX_AREA * width * (height - top)
+    assert numpy.abs(canvas - scrolled[:, :, 2::-1]).mean() < 2.0
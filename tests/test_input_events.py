@@ -0,0 +1,48 @@
+import struct
+
+import pytest
+
+import httprd
+
+
+def test_coalesce_moves_and_scrolls():
+    events = [ [0, 1, 1], [0, 2, 2], [3, 5, 5, -120], [3, 6, 6, -120], [1, 6, 6, 0], [0, 3, 3] ]
+
+    assert httprd.coalesce_input_events(events) == [ [0, 2, 2], [3, 6, 6, -240], [1, 6, 6, 0], [0, 3, 3] ]
+
+
+def test_coalesce_keeps_valid_events_around_malformed():
+    events = [ [0, 1, 1], [], [0, 2, 2], [3, 5, 5, -120], [3, 'x', 5, -120], [3, 6, 6, -120], 'move', [0, 4, 4], [0] ]
+
+    assert httprd.coalesce_input_events(events) == [ [0, 1, 1], [], [0, 2, 2], [3, 5, 5, -120], [3, 'x', 5, -120], [3, 6, 6, -120], 'move', [0, 4, 4], [0] ]
+
+
+def test_coalesce_does_not_merge_across_other_events():
+    events = [ [3, 1, 1, 120], [4, 'a'], [3, 1, 1, 120], [0, 1, 1], [3, 2, 2, 120], [3, 2, 2, 120] ]
+
+    assert httprd.coalesce_input_events(events) == [ [3, 1, 1, 120], [4, 'a'], [3, 1, 1, 120], [0, 1, 1], [3, 2, 2, 240] ]
+
+
+def test_decode_all_event_types():
+    data = struct.pack('<BHH', 0, 10, 20) + struct.pack('<BHHB', 1, 5, 6, 2) + struct.pack('<BHHB', 2, 5, 6, 0) + \
+        struct.pack('<BHHh', 3, 1, 2, -120) + bytes([4, 5]) + b'shift' + bytes([5, 1]) + b'a'
+
+    assert httprd.decode_input_events(data) == [ [0, 10, 20], [1, 5, 6, 2], [2, 5, 6, 0], [3, 1, 2, -120], [4, 'shift'], [5, 'a'] ]
+
+
+@pytest.mark.parametrize('data', [
+    struct.pack('<BHH', 0, 10, 20)[:-1],
+    struct.pack('<BHHB', 1, 5, 6, 2)[:-1],
+    struct.pack('<BHHh', 3, 1, 2, -120)[:-1],
+    bytes([4]),
+    bytes([4, 5]) + b'shi',
+    struct.pack('<BHH', 0, 10, 20) + bytes([0]),
+])
+def test_decode_truncated_packet(data):
+    with pytest.raises(ValueError, match='Truncated'):
+        httprd.decode_input_events(data)
+
+
+def test_decode_unknown_event_type():
+    with pytest.raises(ValueError, match='Unknown'):
+        httprd.decode_input_events(struct.pack('<BHH', 0, 10, 20) + bytes([6, 0, 0, 0, 0]))